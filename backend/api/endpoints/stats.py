@@ -0,0 +1,33 @@
+"""Runtime statistics endpoints (search cache, embedding cache, provider health)."""
+import asyncio
+from typing import Any
+
+from fastapi import APIRouter
+
+from backend.services import embedding
+from backend.services import search as search_service
+from backend.services.embedding_cache import get_embedding_cache
+
+router = APIRouter()
+
+
+@router.get("/search-cache")
+async def search_cache_stats() -> dict[str, Any]:
+    """Search cache hit/miss counters and tier sizes for this worker (disk tier is shared)."""
+    # 磁盘层条数是一次 SQLite count(*)，放到线程里
+    return await asyncio.to_thread(search_service.cache_stats)
+
+
+@router.get("/embedding-cache")
+async def embedding_cache_stats() -> dict[str, Any]:
+    """Embedding cache hit/miss counters and tier sizes for this worker (disk tier is shared), plus micro-batching counters."""
+    out: dict[str, Any] = dict(await asyncio.to_thread(get_embedding_cache().stats))
+    out["microbatch"] = embedding.dispatcher_stats()
+    return out
+
+
+@router.get("/providers")
+async def provider_health() -> dict[str, Any]:
+    """Search provider circuit breaker state (shared across workers) and this worker's latency stats."""
+    # 熔断状态与配额用量都读 SQLite，放到线程里
+    return await asyncio.to_thread(search_service.provider_health)
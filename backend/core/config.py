@@ -7,6 +7,10 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 SearchSource = Literal["exa", "serper", "brave"]
+SearchMode = Literal["sequential", "hedged", "fusion"]
+EmbeddingProviderName = Literal["gemini", "local", "hashing"]
+VectorQuantization = Literal["none", "int8", "binary"]
+VectorSearchMode = Literal["vector", "hybrid"]
 
 
 class Settings(BaseSettings):
@@ -29,20 +33,101 @@ class Settings(BaseSettings):
     LLM_MODEL_ID: str = "gpt-5.2-mini"
     OPENAI_TIMEOUT: float = 60.0  # 秒，整次请求超时（非流式=等完整响应；流式=两段数据间最长等待）。非首 token 时间。
 
-    # Embedding (Gemini)
+    # Embedding：gemini（远程 API）| local（sentence-transformers CPU，可选 ONNX）| hashing（确定性特征哈希，测试 / 离线用）
+    # 不同 provider / 模型 / 维度的向量分库存放（见 vector_store），互不混用
+    EMBEDDING_PROVIDER: EmbeddingProviderName = "gemini"
+    LOCAL_EMBEDDING_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    LOCAL_EMBEDDING_DIMENSION: int = 384  # 小于模型原生维度时按 Matryoshka 截断（模型须支持），大于则报错
+    LOCAL_EMBEDDING_BACKEND: Literal["torch", "onnx"] = "torch"
+    LOCAL_EMBEDDING_BATCH_SIZE: int = 32
+    HASHING_EMBEDDING_DIMENSION: int = 256
     GEMINI_API_KEY: str = ""
     EMBEDDING_MODEL: str = "text-embedding-004"
-    EMBEDDING_DIMENSION: int = 768
+    EMBEDDING_DIMENSION: int = 768  # 作为 outputDimensionality 发送；text-embedding-004 等 Matryoshka 模型可取更小值（如 256）
+    GEMINI_EMBED_RATE_PER_SECOND: float = 25.0  # 每 worker；0 = 不限
+    GEMINI_EMBED_MONTHLY_QUOTA: int = 0  # 全体 worker 共享；0 = 不限
+    EMBED_RATE_LIMIT_MAX_WAIT: float = 30.0  # 秒；embedding 无备选提供方，只能排队
+    EMBED_BATCH_MAX_ITEMS: int = 100  # batchEmbedContents 单次请求条数上限（API 限制 100）
+    EMBED_BATCH_MAX_CHARS: int = 200_000  # 单次批量请求总字符上限，控制请求体大小
+    EMBED_BATCH_CONCURRENCY: int = 4  # 拆分后的批量请求并发数
+    EMBED_BATCH_MAX_RETRIES: int = 3  # 429 / 5xx / 网络错误 / 缺失条目的重试次数
+    EMBED_MICROBATCH_ENABLED: bool = True  # 并发的 embed_texts / embed_text 未命中缓存的文本（跨请求）在短窗口内合并为一次批量请求
+    EMBED_MICROBATCH_MAX_WAIT_MS: float = 10.0  # 窗口：首条到达后最多等待的毫秒数
+    EMBED_MICROBATCH_MAX_SIZE: int = 64  # 窗口内不同文本数达到即立刻发出
+    EMBED_CACHE_ENABLED: bool = True  # 按 (模型, 维度, task type, 文本 SHA-256) 缓存向量，命中不发请求
+    EMBED_CACHE_MEMORY_ENTRIES: int = 4096  # 内存层（每进程 LRU）
+    EMBED_CACHE_DISK_ENABLED: bool = True  # 磁盘层（SQLite float32 blob，多 worker 共享、重启保留）
+    EMBED_CACHE_DISK_MAX_ENTRIES: int = 200_000  # 超出按最近使用时间淘汰
 
     # Retrieval
     TOP_K: int = 3
     MIN_SIMILARITY_SCORE: float = 0.7
+    PASSAGE_MAX_TOKENS: int = 320  # 文档切段：每段估算 token 上限
+    PASSAGE_OVERLAP_TOKENS: int = 48  # 相邻段落重叠
+    PASSAGES_PER_DOCUMENT: int = 3  # 检索 / 网页命中时每篇文档返回的最佳段落数
+    DOCUMENT_MAX_CHARS: int = 200_000  # 入库文档正文上限
+    DOCUMENT_MAX_PASSAGES: int = 64  # 每篇文档最多嵌入的段落数
+    # 段落向量量化：none | int8（4x 更小的粗排列）| binary（1-bit 码 Hamming 预筛，另存 int8 供重打分）
+    VECTOR_QUANTIZATION: VectorQuantization = "none"
+    VECTOR_STORE_FLOAT: bool = True  # 量化时是否保留 float32 列用于全精度重打分；False 时用 int8 重打分，库最小
+    VECTOR_RESCORE_MULTIPLIER: int = 4  # 量化粗排候选数 = 结果数 x 该倍数
+    VECTOR_WRITE_BATCH_SIZE: int = 32  # 单写入任务每个事务最多提交的写入数
+    # VSS HNSW 索引（余弦）：检索为 ORDER BY 距离 LIMIT n，阈值在 top-n 之后过滤
+    VECTOR_HNSW_ENABLED: bool = True
+    VECTOR_HNSW_M: int = 16
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 128
+    VECTOR_HNSW_EF_SEARCH: int = 64  # 实际取 max(该值, 候选数)
+    VECTOR_HNSW_COMPACT_DELETES: int = 10_000  # 累计删除行数达到后压缩索引
+    # 进程内 NumPy 镜像索引（mmap float32 矩阵，<库文件>.mirror/）：检索为矩阵向量乘 + argpartition，DuckDB 仍为权威数据；仅 VECTOR_QUANTIZATION=none
+    VECTOR_MIRROR_ENABLED: bool = False
+    # hybrid: 向量检索与 BM25（DuckDB FTS，段落正文）并发，按 RRF 融合；BM25 命中不受 MIN_SIMILARITY_SCORE 限制
+    VECTOR_SEARCH_MODE: VectorSearchMode = "vector"
+    VECTOR_FTS_REFRESH_SECONDS: float = 300.0  # FTS 索引不随写入更新，有新写入时最多每隔该秒数全量重建一次
+    HYBRID_RRF_K: int = 60
+    # 保留策略（0 / 空表示不限）：按来源的 TTL（"*" 为其余来源的默认值），超出行数 / 字节上限时淘汰最久未命中的文档。
+    # 字节数按正文 + float32 向量估算（不含索引与存储开销）；DuckDB 删除后文件不缩小，空闲块供后续写入复用。
+    # 由写入任务在空闲时（VECTOR_MAINTENANCE_IDLE_SECONDS 内无读写）每隔 VECTOR_MAINTENANCE_INTERVAL_SECONDS 执行，
+    # 顺带做 HNSW 压缩、FTS 刷新和 CHECKPOINT
+    VECTOR_RETENTION_TTL_DAYS: dict[str, float] = {}
+    VECTOR_RETENTION_MAX_ROWS: int = 0
+    VECTOR_RETENTION_MAX_BYTES: int = 0
+    VECTOR_MAINTENANCE_INTERVAL_SECONDS: float = 600.0
+    VECTOR_MAINTENANCE_IDLE_SECONDS: float = 30.0
 
     # Search
     SEARCH_SOURCE: SearchSource = "brave"
+    SEARCH_MODE: SearchMode = "hedged"  # sequential: 逐个失败切换；hedged: 主提供方超时后并发备份；fusion: 两家并发 + RRF 融合
+    SEARCH_HEDGE_MIN_DELAY: float = 0.3  # 秒；对冲延迟 = 平均延迟 x1.5，夹在 [MIN, MAX]
+    SEARCH_HEDGE_MAX_DELAY: float = 2.0
+    SEARCH_MANY_CONCURRENCY: int = 4  # search_web_many 无原生批量接口时的并发上限
+
+    # Rate limiting（令牌桶按 worker 计；月度配额通过 SQLite 全体 worker 共享；0 = 不限）
+    BRAVE_RATE_PER_SECOND: float = 1.0
+    BRAVE_MONTHLY_QUOTA: int = 0
+    SERPER_RATE_PER_SECOND: float = 5.0
+    SERPER_MONTHLY_QUOTA: int = 0
+    EXA_RATE_PER_SECOND: float = 5.0
+    EXA_MONTHLY_QUOTA: int = 0
+    RATE_LIMIT_MAX_WAIT: float = 0.5  # 秒；搜索令牌不足时最多排队这么久，否则切到下一个提供方
+
+    # Circuit breaker（提供方健康状态，多 worker 通过 SQLite 共享）
+    CIRCUIT_FAILURE_THRESHOLD: int = 3  # 连续失败次数达到即熔断；429 立即熔断
+    CIRCUIT_OPEN_SECONDS: float = 30.0  # 首次熔断时长，之后每次重新熔断翻倍
+    CIRCUIT_MAX_OPEN_SECONDS: float = 900.0
+    CIRCUIT_PROBE_TIMEOUT: float = 30.0  # 半开探测租约超时，探测方未回报则允许下一次探测
     BRAVE_API_KEY: str = ""
     EXA_API_KEY: str = ""
+    EXA_CONTENTS_MAX_CHARS: int = 8000  # Exa 随搜索结果返回正文（>0 启用），命中时跳过 fetch_content
     SERPER_API_KEY: str = ""
+    SEARCH_CACHE_TTL_SECONDS: int = 300  # 内存层（每进程 LRU）
+    SEARCH_CACHE_MAX_ENTRIES: int = 1024
+    SEARCH_CACHE_DISK_ENABLED: bool = True  # 磁盘层（SQLite，多 worker 共享、重启保留）
+    SEARCH_CACHE_DISK_TTL_SECONDS: int = 86_400
+    SEARCH_CACHE_DISK_MAX_ENTRIES: int = 50_000
+    SEARCH_SEMANTIC_CACHE_ENABLED: bool = True  # 子任务措辞不同但语义相同时复用搜索结果
+    SEARCH_SEMANTIC_CACHE_THRESHOLD: float = 0.92  # 余弦相似度阈值
+    SEARCH_SEMANTIC_CACHE_TTL_SECONDS: int = 1800
+    SEARCH_SEMANTIC_CACHE_MAX_ENTRIES: int = 2048
 
     # Jina Reader (content fetch fallback)
     JINA_READER_ENABLED: bool = True
@@ -51,6 +136,12 @@ class Settings(BaseSettings):
     JINA_API_KEY: str = ""
     JINA_USE_API_KEY: bool = False
 
+    # Document extraction (non-HTML results: PDF text layer / plain text / markdown)
+    DOCUMENT_MAX_BYTES: int = 20_000_000  # 超过即拒绝，不下载完整文件
+    DOCUMENT_EXTRACT_TIMEOUT: float = 20.0  # 秒，单个 PDF 抽取上限
+    DOCUMENT_EXTRACT_WORKERS: int = 2  # 抽取进程池大小
+    PDF_MAX_PAGES: int = 30
+
     # Optional: SQLite for future use (plan mentions DuckDB for vectors)
     DATABASE_URL: str = "sqlite:///./wisdomprompt.db"
 
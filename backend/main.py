@@ -7,6 +7,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from backend.core.config import get_settings
 from backend.core.logging_config import configure_logging, get_logger
 from backend.api.routes import api_router
+from backend.services import document_extract, vector_store
+from backend.services.http_client import close_http_client
 
 configure_logging(json_logs=False)
 logger = get_logger(__name__)
@@ -16,7 +18,15 @@ logger = get_logger(__name__)
 async def lifespan(app: FastAPI):
     """Application lifespan: startup and shutdown."""
     logger.info("startup", msg="WisdomPrompt backend starting")
+    try:
+        # 扩展加载与建表只在启动时做一次；失败时首次读写会再试
+        await vector_store.get_vector_store().open()
+    except Exception as e:
+        logger.warning("vector_store_open_failed", error=str(e))
     yield
+    await vector_store.close_vector_store()
+    document_extract.shutdown_pool()
+    await close_http_client()
     logger.info("shutdown", msg="WisdomPrompt backend shutting down")
 
 
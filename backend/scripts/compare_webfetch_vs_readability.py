@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 同一份 HTML 下对比：旧 webfetch（_html_to_text）vs 新 Readability（_readability_to_markdown）。
-GitHub blob 链接会先显示 raw 内容（fetch_content 实际使用的方式），再显示页面 HTML 的两种提取。
+命中站点适配器的链接（GitHub / Wikipedia / arXiv / Stack Overflow）会先显示适配器结果（fetch_content 实际使用的方式），再显示页面 HTML 的两种提取。
 从项目根运行: PYTHONPATH=. .venv/bin/python backend/scripts/compare_webfetch_vs_readability.py [URL]
 """
 import asyncio
@@ -16,18 +16,21 @@ async def main():
     url = sys.argv[1] if len(sys.argv) > 1 else "https://example.com"
     print(f"URL: {url}\n")
 
-    from backend.services import content_fetch
+    from backend.services import content_fetch, site_adapters
 
-    is_github_blob = content_fetch._is_github_blob_url(url)
+    matched = site_adapters.match_adapter(url)
+    adapter_name = matched[0].name if matched else None
+    is_github_blob = adapter_name == "github_blob"
     raw_content = None
-    if is_github_blob:
-        raw_content, _ = await content_fetch._github_raw_fetch(url)
+    if matched:
+        adapted = await site_adapters.fetch_via_adapter(url, timeout=content_fetch._WEBFETCH_TIMEOUT)
+        raw_content = adapted["content"] if adapted else None
 
-    # 0. GitHub raw（仅 blob 链接有；fetch_content 实际会用此）
+    # 0. 站点适配器（仅命中的链接有；fetch_content 实际会用此）
     if raw_content:
         print("=" * 60)
-        print("0. GitHub raw（fetch_content 对 blob 链接实际使用）")
-        print("   做法: blob 转 raw.githubusercontent.com 拉取文件原文")
+        print(f"0. 站点适配器 {adapter_name}（fetch_content 实际使用）")
+        print("   做法: 走站点 API / raw 地址，一次小请求拿正文")
         print(f"   结果长度: {len(raw_content)} 字符")
         print("   预览（前 400 字）:")
         print("-" * 40)
@@ -44,8 +47,8 @@ async def main():
         raw_html, err = await content_fetch._webfetch_raw(url)
     if not raw_html:
         print(f"页面 HTML 拉取失败: {err}")
-        if is_github_blob and raw_content:
-            print("（上方的 GitHub raw 为实际使用结果；两种方法需页面 HTML 才能对比，可稍后重试）")
+        if raw_content:
+            print("（上方的适配器结果为实际使用结果；两种方法需页面 HTML 才能对比，可稍后重试）")
         else:
             sys.exit(1)
         return
@@ -81,7 +84,7 @@ async def main():
     print("=" * 60)
     print("对比小结")
     if raw_content is not None:
-        print(f"  GitHub raw 长度: {len(raw_content)}（实际使用）")
+        print(f"  适配器 {adapter_name} 长度: {len(raw_content)}（实际使用）")
     print(f"  旧 webfetch 长度: {len(old_text)}  新 Readability 长度: {len(new_md)}")
     if is_github_blob:
         print("  GitHub blob：raw 为文件正文；旧 webfetch 多为导航；新 Readability 易抽到错误文案。")
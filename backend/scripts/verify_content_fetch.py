@@ -16,7 +16,7 @@ async def main():
     url = sys.argv[1] if len(sys.argv) > 1 else "https://zhuanlan.zhihu.com/p/639453312"
     print(f"URL: {url}\n")
 
-    from backend.services import content_fetch
+    from backend.services import content_fetch, site_adapters
 
     try:
         out = await content_fetch.fetch_content(url)
@@ -24,7 +24,8 @@ async def main():
         content = out.get("content", "")
         print(f"source={source} content_len={len(content)}")
         print(f"content 前 200 字: {content[:200].replace(chr(10), ' ')}...")
-        assert source in ("readability", "webfetch", "jina"), f"unexpected source: {source}"
+        known = ("readability", "webfetch", "pdf", "jina", *site_adapters.adapter_names())
+        assert source in known, f"unexpected source: {source}"
         assert content, "content 为空"
         print("\n验证通过：content_fetch 可跑通（Readability / webfetch / Jina）。")
     except Exception as e:
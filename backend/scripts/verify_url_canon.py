@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+验证 URL 规范化（url_canon.canonicalize_url）：同一页面的不同写法应归一，不同页面不应合并。
+从项目根运行: PYTHONPATH=. python backend/scripts/verify_url_canon.py
+"""
+import os
+import sys
+
+_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(_root)
+sys.path.insert(0, _root)
+
+# (输入, 期望的规范 URL)
+CORPUS = [
+    # 通用：协议、大小写、默认端口、片段、尾斜杠、跟踪参数、参数排序
+    ("http://Example.com/a/b/", "https://example.com/a/b"),
+    ("https://example.com:443/a#section", "https://example.com/a"),
+    ("http://example.com:80/", "https://example.com/"),
+    ("https://example.com", "https://example.com/"),
+    ("example.com/path", "https://example.com/path"),
+    ("https://example.com:8080/x", "https://example.com:8080/x"),
+    ("https://example.com/a?utm_source=x&utm_medium=y&id=3", "https://example.com/a?id=3"),
+    ("https://example.com/a?b=2&a=1&gclid=zzz&fbclid=q", "https://example.com/a?a=1&b=2"),
+    ("https://example.com//a//b", "https://example.com/a/b"),
+    ("https://m.example.com/news/1", "https://example.com/news/1"),
+    ("https://mobile.example.com/news/1", "https://example.com/news/1"),
+    ("https://m.co/x", "https://m.co/x"),
+    # GitHub
+    ("https://www.github.com/owner/repo/", "https://github.com/owner/repo"),
+    ("https://github.com/owner/repo.git", "https://github.com/owner/repo"),
+    ("https://github.com/owner/repo?tab=readme-ov-file", "https://github.com/owner/repo"),
+    ("https://github.com/owner/repo/blob/main/README.md#usage", "https://github.com/owner/repo/blob/main/README.md"),
+    # Wikipedia
+    ("https://en.m.wikipedia.org/wiki/Python_(programming_language)", "https://en.wikipedia.org/wiki/Python_(programming_language)"),
+    ("http://zh.wikipedia.org/wiki/Python#历史", "https://zh.wikipedia.org/wiki/Python"),
+    # YouTube
+    ("https://youtu.be/dQw4w9WgXcQ?si=abc", "https://www.youtube.com/watch?v=dQw4w9WgXcQ"),
+    ("https://m.youtube.com/watch?v=dQw4w9WgXcQ&feature=share&t=10", "https://www.youtube.com/watch?v=dQw4w9WgXcQ"),
+    # Stack Exchange
+    ("https://stackoverflow.com/questions/4906977/how-to-access-environment-variables", "https://stackoverflow.com/questions/4906977"),
+    ("https://stackoverflow.com/q/4906977", "https://stackoverflow.com/questions/4906977"),
+    ("https://stackoverflow.com/questions/4906977/how/4907053#4907053", "https://stackoverflow.com/questions/4906977"),
+    ("https://unix.stackexchange.com/questions/123/slug", "https://unix.stackexchange.com/questions/123"),
+    # arXiv
+    ("https://arxiv.org/pdf/2301.00001v2.pdf", "https://arxiv.org/abs/2301.00001v2"),
+    ("http://export.arxiv.org/abs/2301.00001", "https://arxiv.org/abs/2301.00001"),
+    # CSDN / 知乎 / Medium / X
+    ("https://blog.csdn.net/u/article/details/123?spm=1001.2014&depth_1-utm_source=x", "https://blog.csdn.net/u/article/details/123"),
+    ("https://zhuanlan.zhihu.com/p/639453312?utm_psn=1&share_code=x", "https://zhuanlan.zhihu.com/p/639453312"),
+    ("https://zhihu.com/question/1", "https://www.zhihu.com/question/1"),
+    ("https://medium.com/@a/post-123?source=rss&sk=abc", "https://medium.com/@a/post-123"),
+    ("https://mobile.twitter.com/user/status/1?s=20", "https://x.com/user/status/1"),
+    # 不应改写
+    ("ftp://example.com/file", "ftp://example.com/file"),
+    ("", ""),
+]
+
+# 应视为不同页面的对
+DISTINCT = [
+    ("https://example.com/a?id=1", "https://example.com/a?id=2"),
+    ("https://github.com/owner/repo", "https://github.com/owner/repo2"),
+    ("https://arxiv.org/abs/2301.00001v1", "https://arxiv.org/abs/2301.00001v2"),
+    ("https://www.youtube.com/watch?v=a", "https://www.youtube.com/watch?v=b"),
+]
+
+
+def main():
+    from backend.services.url_canon import canonicalize_url
+
+    failed = 0
+    for raw, expected in CORPUS:
+        got = canonicalize_url(raw)
+        if got != expected:
+            failed += 1
+            print(f"FAIL {raw!r}\n     got      {got!r}\n     expected {expected!r}")
+    for a, b in DISTINCT:
+        if canonicalize_url(a) == canonicalize_url(b):
+            failed += 1
+            print(f"FAIL merged distinct pages: {a!r} / {b!r}")
+    total = len(CORPUS) + len(DISTINCT)
+    print(f"{total - failed}/{total} 通过")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Circuit breaker (closed / open / half-open) per provider, state shared across uvicorn workers via SQLite.
+
+Methods are blocking (SQLite, possibly waiting on another worker's write lock); async callers use asyncio.to_thread.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from backend.core.config import get_settings
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _health_db_path() -> Path:
+    base = os.environ.get("WISDOMPROMPT_DATA_DIR")
+    if base:
+        return Path(base) / "provider_health.sqlite3"
+    return Path(__file__).resolve().parents[2] / "data" / "provider_health.sqlite3"
+
+
+class CircuitBreaker:
+    """
+    closed: calls pass; consecutive failures (or any 429) open the circuit.
+    open: calls are refused until open_until; each re-open doubles the window (capped). Failures of
+    requests already in flight when the circuit opened are counted but do not extend the window.
+    half_open: exactly one caller (across all workers) holds the probe lease; its success closes the
+    circuit, its failure re-opens it. Results that land while the circuit is open (requests already in
+    flight when it tripped) do not change it. A probe that is abandoned should call release_probe; a
+    lease that is never reported back expires after the probe timeout.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        path = path or _health_db_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None：显式 BEGIN IMMEDIATE，读改写在多进程间原子
+        self._conn = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS breaker ("
+            " name TEXT PRIMARY KEY, state TEXT NOT NULL, failures INTEGER NOT NULL DEFAULT 0,"
+            " open_count INTEGER NOT NULL DEFAULT 0, open_until REAL NOT NULL DEFAULT 0,"
+            " probe_until REAL NOT NULL DEFAULT 0, last_error TEXT, updated_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def _row(self, name: str) -> tuple[str, int, int, float, float]:
+        row = self._conn.execute(
+            "SELECT state, failures, open_count, open_until, probe_until FROM breaker WHERE name = ?", (name,)
+        ).fetchone()
+        return row or (CLOSED, 0, 0, 0.0, 0.0)
+
+    def is_callable(self, name: str) -> bool:
+        """Non-mutating check used for candidate selection."""
+        now = time.time()
+        with self._lock:
+            state, _, _, open_until, probe_until = self._row(name)
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return now >= open_until
+        return now >= probe_until
+
+    def acquire(self, name: str) -> Optional[str]:
+        """Call right before the request. None: refused; CLOSED: normal call; HALF_OPEN: this caller holds
+        the probe lease (only one across all workers gets it)."""
+        now = time.time()
+        with self._lock:
+            state, _, _, open_until, probe_until = self._row(name)
+            if state == CLOSED:
+                return CLOSED
+            if (state == OPEN and now < open_until) or (state == HALF_OPEN and now < probe_until):
+                return None
+            probe_timeout = get_settings().CIRCUIT_PROBE_TIMEOUT
+            cur = self._conn.execute(
+                "UPDATE breaker SET state = ?, probe_until = ?, updated_at = ? WHERE name = ?"
+                " AND ((state = ? AND open_until <= ?) OR (state = ? AND probe_until <= ?))",
+                (HALF_OPEN, now + probe_timeout, now, name, OPEN, now, HALF_OPEN, now),
+            )
+        if cur.rowcount == 1:
+            logger.info("circuit_half_open_probe", provider=name)
+            return HALF_OPEN
+        return None
+
+    def release_probe(self, name: str) -> None:
+        """Give the probe lease back without a result (the probe was cancelled), so the next caller can probe."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE breaker SET probe_until = 0, updated_at = ? WHERE name = ? AND state = ?",
+                (time.time(), name, HALF_OPEN),
+            )
+
+    def record_success(self, name: str) -> None:
+        now = time.time()
+        with self._lock:
+            state, failures = self._row(name)[:2]
+            if state == CLOSED and failures == 0:
+                return  # 常见路径只读不写
+            if state == OPEN:
+                return  # 熔断前已发出的请求迟到的成功：不撤销熔断、不重置退避
+            self._conn.execute(
+                "INSERT INTO breaker (name, state, failures, open_count, updated_at) VALUES (?, ?, 0, 0, ?)"
+                " ON CONFLICT(name) DO UPDATE SET state = excluded.state, failures = 0, open_count = 0,"
+                " open_until = 0, probe_until = 0, updated_at = excluded.updated_at",
+                (name, CLOSED, now),
+            )
+        if state != CLOSED:
+            logger.info("circuit_closed", provider=name)
+
+    def record_failure(self, name: str, rate_limited: bool = False, error: str = "") -> None:
+        settings = get_settings()
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                state, failures, open_count, open_until, _ = self._row(name)
+                failures += 1
+                if state == OPEN:
+                    # 熔断前已发出的请求迟到的失败：只计数，不重新打开、不翻倍窗口
+                    trip = False
+                    self._conn.execute(
+                        "UPDATE breaker SET failures = ?, last_error = ?, updated_at = ? WHERE name = ?",
+                        (failures, error[:200], now, name),
+                    )
+                else:
+                    # CLOSED 达到阈值（或 429），或 HALF_OPEN 唯一探测失败
+                    trip = state == HALF_OPEN or rate_limited or failures >= settings.CIRCUIT_FAILURE_THRESHOLD
+                    open_until = 0.0
+                    if trip:
+                        open_until = now + min(
+                            settings.CIRCUIT_OPEN_SECONDS * (2**open_count), settings.CIRCUIT_MAX_OPEN_SECONDS
+                        )
+                        open_count += 1
+                    self._conn.execute(
+                        "INSERT INTO breaker (name, state, failures, open_count, open_until, probe_until, last_error, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?, 0, ?, ?) ON CONFLICT(name) DO UPDATE SET state = excluded.state,"
+                        " failures = excluded.failures, open_count = excluded.open_count, open_until = excluded.open_until,"
+                        " probe_until = 0, last_error = excluded.last_error, updated_at = excluded.updated_at",
+                        (name, OPEN if trip else state, failures, open_count, open_until, error[:200], now),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if trip:
+            logger.warning(
+                "circuit_opened",
+                provider=name,
+                rate_limited=rate_limited,
+                open_seconds=round(open_until - now, 1),
+            )
+
+    def snapshot(self) -> dict[str, dict]:
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, state, failures, open_count, open_until, probe_until, last_error, updated_at FROM breaker"
+            ).fetchall()
+        out = {}
+        for name, state, failures, open_count, open_until, probe_until, last_error, updated_at in rows:
+            if state == OPEN and now >= open_until:
+                state = HALF_OPEN  # 窗口已过，下一次调用即探测
+            out[name] = {
+                "state": state,
+                "consecutive_failures": failures,
+                "open_count": open_count,
+                "retry_in_seconds": round(max(0.0, open_until - now), 1) if state == OPEN else 0.0,
+                "last_error": last_error,
+                "updated_at": updated_at,
+            }
+        return out
+
+
+_breaker: Optional[CircuitBreaker] = None
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Singleton breaker (SQLite-backed; every worker sees the same provider health)."""
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker()
+    return _breaker
@@ -1,4 +1,4 @@
-"""Content fetch: webfetch first with retry, then Readability (Mozilla), then Jina Reader fallback with daily limit."""
+"""Content fetch: site adapters, then content-type dispatch (HTML via Readability / webfetch, PDF / text / markdown extraction) with retry, then Jina Reader fallback with daily limit."""
 
 from __future__ import annotations
 
@@ -13,6 +13,9 @@ from typing import Optional
 import httpx
 from backend.core.config import get_settings
 from backend.core.logging_config import get_logger
+from backend.services import document_extract, site_adapters
+from backend.services.document_extract import DocumentKind, UnsupportedContentError
+from backend.services.url_canon import canonicalize_url
 
 logger = get_logger(__name__)
 
@@ -98,47 +101,6 @@ _READABILITY_BAD_PHRASES = (
 )
 
 
-def _is_github_blob_url(url: str) -> bool:
-    return "github.com" in url and "/blob/" in url
-
-
-def _github_blob_to_raw_url(url: str) -> Optional[str]:
-    """github.com/owner/repo/blob/branch/path -> raw.githubusercontent.com/owner/repo/branch/path"""
-    try:
-        from urllib.parse import urlparse
-
-        p = urlparse(url)
-        if p.netloc not in ("github.com", "www.github.com"):
-            return None
-        parts = p.path.strip("/").split("/")
-        if len(parts) >= 5 and parts[2] == "blob":
-            owner, repo, _, branch, *path = parts
-            raw_path = "/".join([owner, repo, branch] + path)
-            return f"https://raw.githubusercontent.com/{raw_path}"
-    except Exception:
-        pass
-    return None
-
-
-async def _github_raw_fetch(url: str) -> tuple[Optional[str], Optional[str]]:
-    """GitHub blob URL 时直接拉 raw 文件内容。返回 (content, error)。"""
-    raw_url = _github_blob_to_raw_url(url)
-    if not raw_url:
-        return None, None
-    try:
-        async with httpx.AsyncClient(
-            follow_redirects=True,
-            timeout=_WEBFETCH_TIMEOUT,
-            headers={"User-Agent": _USER_AGENT},
-        ) as client:
-            resp = await client.get(raw_url)
-            resp.raise_for_status()
-            text = resp.text
-            return (text[:_MAX_BODY] if len(text) > _MAX_BODY else text), None
-    except Exception as e:
-        return None, str(e)
-
-
 def _readability_result_ok(content: str) -> bool:
     """Readability 抽到的内容是否可信：过短或含错误文案则用旧 webfetch。"""
     if not content or len(content.strip()) < _READABILITY_MIN_LEN:
@@ -150,22 +112,67 @@ def _readability_result_ok(content: str) -> bool:
     return True
 
 
+async def _read_capped(resp: httpx.Response, url: str) -> tuple[DocumentKind, bytes]:
+    """Classify a streamed response from headers + first chunk, then read the body under the kind's size cap.
+    HTML / text past the cap is truncated there; an oversized PDF is rejected (a cut PDF cannot be parsed)."""
+    chunks = resp.aiter_bytes()
+    first = await anext(chunks, b"")
+    kind = document_extract.classify(resp.headers.get("content-type", ""), url, first)
+    limit = document_extract.max_bytes(kind)
+    declared = resp.headers.get("content-length", "")
+    if kind == "pdf" and declared.isdigit() and int(declared) > limit:
+        raise UnsupportedContentError(f"{kind} too large: {declared} bytes")
+    buf = bytearray(first)
+    while len(buf) <= limit:
+        chunk = await anext(chunks, None)
+        if chunk is None:
+            break
+        buf += chunk
+    if len(buf) > limit:
+        if kind == "pdf":
+            raise UnsupportedContentError(f"{kind} too large: > {limit} bytes")
+        # 超大页面停在上限处截断，照常抽取（与原先 webfetch 的截断行为一致）
+        del buf[limit:]
+    return kind, bytes(buf)
+
+
+async def _webfetch_document(
+    url: str, timeout: float = _WEBFETCH_TIMEOUT
+) -> tuple[DocumentKind, bytes, Optional[str]]:
+    """Stream URL; returns (kind, body, charset). Unsupported binaries are rejected after the first chunk."""
+    async with httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=timeout,
+        headers={"User-Agent": _USER_AGENT, "Accept-Language": "en-US,en;q=0.9"},
+    ) as client:
+        async with client.stream("GET", url) as resp:
+            resp.raise_for_status()
+            kind, data = await _read_capped(resp, str(resp.url))
+            return kind, data, resp.charset_encoding
+
+
+async def _document_to_text(kind: DocumentKind, data: bytes, charset: Optional[str]) -> str:
+    if kind == "pdf":
+        text = await document_extract.extract_pdf(data, _MAX_BODY)
+        if not text.strip():
+            raise UnsupportedContentError("PDF has no text layer")
+        return text
+    text = document_extract.decode_text(data, charset)
+    if kind == "html":
+        return _html_to_text(text)
+    return text[:_MAX_BODY] if len(text) > _MAX_BODY else text
+
+
 async def _webfetch_once(
     url: str, timeout: float = _WEBFETCH_TIMEOUT
 ) -> tuple[Optional[str], Optional[str]]:
-    """Fetch URL and return (content_text, error_message)."""
+    """Fetch URL and return (content_text, error_message). Dispatches on content-type: HTML / PDF / text / markdown.
+    Raises UnsupportedContentError for binaries and oversized documents (no point retrying)."""
     try:
-        async with httpx.AsyncClient(
-            follow_redirects=True,
-            timeout=timeout,
-            headers={"User-Agent": _USER_AGENT, "Accept-Language": "en-US,en;q=0.9"},
-        ) as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            ct = resp.headers.get("content-type", "")
-            if "text/html" in ct:
-                return _html_to_text(resp.text), None
-            return resp.text[:_MAX_BODY], None
+        kind, data, charset = await _webfetch_document(url, timeout=timeout)
+        return await _document_to_text(kind, data, charset), None
+    except UnsupportedContentError:
+        raise
     except Exception as e:
         return None, str(e)
 
@@ -175,17 +182,10 @@ async def _webfetch_raw(
 ) -> tuple[Optional[str], Optional[str]]:
     """Fetch URL and return (raw_html, error_message). Only returns HTML for text/html; else (None, err)."""
     try:
-        async with httpx.AsyncClient(
-            follow_redirects=True,
-            timeout=timeout,
-            headers={"User-Agent": _USER_AGENT, "Accept-Language": "en-US,en;q=0.9"},
-        ) as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            ct = resp.headers.get("content-type", "")
-            if "text/html" not in ct:
-                return None, "content-type is not text/html"
-            return resp.text, None
+        kind, data, charset = await _webfetch_document(url, timeout=timeout)
+        if kind != "html":
+            return None, "content-type is not text/html"
+        return document_extract.decode_text(data, charset), None
     except Exception as e:
         return None, str(e)
 
@@ -244,8 +244,10 @@ async def _jina_read(
 
 async def fetch_content(url: str) -> dict:
     """
-    Fetch page content: GitHub raw（blob 链接）> raw HTML + Readability/webfetch > webfetch 重试 > Jina。
-    Returns {"content": str, "url": str, "source": "webfetch"|"readability"|"jina"} or raises.
+    Fetch page content: 站点适配器（site_adapters）> 流式拉取按 content-type 分发（HTML: Readability/webfetch；PDF/文本/Markdown: 直接抽取）> webfetch 重试 > Jina。
+    Returns {"content": str, "url": str (as requested), "canonical_url": str (see url_canon), "source": "webfetch"|"readability"|"pdf"|"jina"|<adapter name>,
+    "content_type": "html"|"pdf"|"text"|"markdown" (absent when the fallback path cannot tell)} or raises
+    (UnsupportedContentError for binaries / oversized documents, RuntimeError when every path failed).
     """
     settings = get_settings()
 
@@ -260,33 +262,56 @@ async def fetch_content(url: str) -> dict:
     if url.startswith(_JINA_READER_PREFIX):
         # Avoid double-wrapping when caller passes r.jina.ai URL directly.
         url = url[len(_JINA_READER_PREFIX) :]
+    # 规范 URL 只作去重键（canonical_url）；请求与返回的 url 保持调用方给的写法，避免 https 升级等改写打不开老站点
+    canonical = canonicalize_url(url) or url
+
+    # 明显的二进制链接（压缩包 / 图片 / 音视频 / Office）直接拒绝，不发请求
+    document_extract.reject_by_url(url)
 
-    # GitHub blob 链接直接拉 raw 文件，避免 Readability 抽到错误区域
-    if _is_github_blob_url(url):
-        content, err = await _github_raw_fetch(url)
+    # 站点适配器（GitHub / Wikipedia / arXiv / Stack Overflow）走 API 或 raw，一次小请求拿干净正文
+    adapted = await site_adapters.fetch_via_adapter(canonical, timeout=webfetch_timeout)
+    if adapted:
+        return {**adapted, "url": url, "canonical_url": canonical}
+
+    # 一次流式拉取按 content-type 分发：HTML 优先 Readability（不可信时回退旧 webfetch），PDF / 纯文本 / Markdown 直接抽取
+    try:
+        kind, data, charset = await _webfetch_document(url, timeout=webfetch_timeout)
+    except UnsupportedContentError:
+        raise
+    except Exception as e:
+        kind, data, charset = None, b"", None
+        logger.info("webfetch_stream_failed", url=url, error=str(e)[:200])
+    if kind == "html" and _readability_available():
+        raw_html = document_extract.decode_text(data, charset)
+        content = _readability_to_markdown(raw_html)
+        if content and _readability_result_ok(content):
+            return {
+                "content": content,
+                "url": url,
+                "canonical_url": canonical,
+                "source": "readability",
+                "content_type": "html",
+            }
+    if kind is not None:
+        content = await _document_to_text(kind, data, charset)
         if content:
-            return {"content": content, "url": url, "source": "webfetch"}
-
-    # 一次 raw 拉取：优先 Readability，结果不可信时回退到旧 webfetch
-    if _readability_available():
-        raw_html, _ = await _webfetch_raw(url, timeout=webfetch_timeout)
-        if raw_html:
-            content = _readability_to_markdown(raw_html)
-            if content and _readability_result_ok(content):
-                return {"content": content, "url": url, "source": "readability"}
-            content = _html_to_text(raw_html)
-            if content:
-                return {"content": content, "url": url, "source": "webfetch"}
+            return {
+                "content": content,
+                "url": url,
+                "canonical_url": canonical,
+                "source": "pdf" if kind == "pdf" else "webfetch",
+                "content_type": kind,
+            }
 
     content, err = await _webfetch_once(url, timeout=webfetch_timeout)
     if content is not None:
-        return {"content": content, "url": url, "source": "webfetch"}
+        return {"content": content, "url": url, "canonical_url": canonical, "source": "webfetch"}
     logger.info("webfetch_failed_first", url=url, error=err)
     if not is_fast_fail:
         await asyncio.sleep(2)
         content, err = await _webfetch_once(url, timeout=webfetch_timeout)
         if content is not None:
-            return {"content": content, "url": url, "source": "webfetch"}
+            return {"content": content, "url": url, "canonical_url": canonical, "source": "webfetch"}
         logger.info("webfetch_failed_retry", url=url, error=err)
 
     if not settings.JINA_READER_ENABLED:
@@ -309,4 +334,4 @@ async def fetch_content(url: str) -> dict:
     if new_tokens > settings.JINA_DAILY_LIMIT_TOKENS:
         raise RuntimeError("Jina daily token limit reached")
     _write_jina_usage(day, count + 1, new_tokens)
-    return {"content": content, "url": url, "source": "jina"}
+    return {"content": content, "url": url, "canonical_url": canonical, "source": "jina", "content_type": "markdown"}
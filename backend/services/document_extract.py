@@ -0,0 +1,187 @@
+"""Non-HTML document handling for content fetch: content-type dispatch, PDF text layer extraction in a worker pool."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Literal, Optional
+from urllib.parse import urlparse
+
+from backend.core.config import get_settings
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DocumentKind = Literal["html", "pdf", "text", "markdown"]
+
+_TEXT_TYPES = ("text/plain", "text/csv", "application/json", "application/xml", "text/xml")
+_MARKDOWN_TYPES = ("text/markdown", "text/x-markdown")
+_MARKDOWN_EXTS = (".md", ".markdown", ".rst")
+_TEXT_EXTS = (".txt", ".csv", ".json", ".xml", ".log")
+# 常见二进制：不下载、不抽取，直接拒绝（避免乱码进 embedding / DuckDB / LLM）
+_BINARY_EXTS = (
+    ".zip", ".gz", ".tgz", ".tar", ".rar", ".7z", ".exe", ".dmg", ".msi", ".apk", ".iso", ".bin",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".ico", ".bmp",
+    ".mp3", ".mp4", ".wav", ".avi", ".mov", ".mkv", ".webm",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".epub",
+)
+
+
+class UnsupportedContentError(RuntimeError):
+    """Raised when a URL points to content we do not extract (binary, oversized); not worth retrying."""
+
+
+def _url_ext(url: str) -> str:
+    path = urlparse(url).path.lower()
+    dot = path.rfind(".")
+    return path[dot:] if dot > path.rfind("/") else ""
+
+
+def reject_by_url(url: str) -> None:
+    """Reject obvious binary URLs before any request is made."""
+    ext = _url_ext(url)
+    if ext in _BINARY_EXTS:
+        raise UnsupportedContentError(f"unsupported document type: {ext}")
+
+
+def classify(content_type: str, url: str, head: bytes = b"") -> DocumentKind:
+    """Map Content-Type (plus URL extension / magic bytes as fallback) to a document kind; raise if unsupported."""
+    ct = content_type.split(";", 1)[0].strip().lower()
+    ext = _url_ext(url)
+    if ct == "application/pdf" or head.startswith(b"%PDF-"):
+        return "pdf"
+    if ct in ("text/html", "application/xhtml+xml"):
+        return "html"
+    if ct in _MARKDOWN_TYPES or (ct == "text/plain" and ext in _MARKDOWN_EXTS):
+        return "markdown"
+    if ct in _TEXT_TYPES or ct.startswith("text/"):
+        return "text"
+    if ct in ("", "application/octet-stream", "binary/octet-stream"):
+        # 部分服务器不给准确类型：按扩展名兜底
+        if ext == ".pdf":
+            return "pdf"
+        if ext in _MARKDOWN_EXTS:
+            return "markdown"
+        if ext in _TEXT_EXTS:
+            return "text"
+        if not ct and head.lstrip()[:1] == b"<":
+            return "html"
+        if not ct and head and b"\x00" not in head[:1024]:
+            return "text"
+    raise UnsupportedContentError(f"unsupported content-type: {ct or 'unknown'}")
+
+
+def max_bytes(kind: DocumentKind) -> int:
+    """Download cap per kind: documents get DOCUMENT_MAX_BYTES, HTML/text keep a smaller cap."""
+    settings = get_settings()
+    if kind == "pdf":
+        return settings.DOCUMENT_MAX_BYTES
+    return min(settings.DOCUMENT_MAX_BYTES, 5_000_000)
+
+
+def decode_text(data: bytes, encoding: Optional[str]) -> str:
+    try:
+        return data.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        return data.decode("utf-8", errors="replace")
+
+
+def _pdf_available() -> bool:
+    try:
+        import pypdf  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+def _extract_pdf_sync(data: bytes, max_pages: int, max_chars: int, deadline_seconds: float) -> str:
+    """Runs in a worker process: text layer only, stops at page cap / char cap / deadline."""
+    from pypdf import PdfReader
+
+    deadline = time.monotonic() + deadline_seconds
+    reader = PdfReader(BytesIO(data))
+    parts: list[str] = []
+    total = 0
+    for i, page in enumerate(reader.pages):
+        if i >= max_pages or total >= max_chars or time.monotonic() > deadline:
+            break
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            continue
+        text = text.strip()
+        if text:
+            parts.append(text)
+            total += len(text)
+    out = "\n\n".join(parts)
+    return out[:max_chars]
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        workers = get_settings().DOCUMENT_EXTRACT_WORKERS or min(2, os.cpu_count() or 1)
+        _POOL = ProcessPoolExecutor(max_workers=workers)
+    return _POOL
+
+
+def shutdown_pool() -> None:
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool (a worker died) or one with a stuck worker: kill its processes so no slot stays
+    occupied; the next extract_pdf starts a fresh pool. Other extractions running in it fail and are retried
+    by nobody, same as a timeout."""
+    global _POOL
+    if _POOL is pool:
+        _POOL = None
+    # 3.11 没有公开的 kill_workers；超时的子进程不会自己退出，只能直接杀掉
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for proc in processes:
+        if proc.is_alive():
+            proc.kill()
+
+
+async def extract_pdf(data: bytes, max_chars: int) -> str:
+    """Extract the PDF text layer in the worker pool with page cap and time limit. Scanned PDFs yield ''."""
+    if not _pdf_available():
+        raise UnsupportedContentError("pypdf not installed; cannot extract PDF")
+    settings = get_settings()
+    timeout = settings.DOCUMENT_EXTRACT_TIMEOUT
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    try:
+        fut = loop.run_in_executor(
+            pool,
+            _extract_pdf_sync,
+            data,
+            settings.PDF_MAX_PAGES,
+            max_chars,
+            # 子进程内按页检查截止时间，留出序列化余量；外层 wait_for 兜底
+            max(1.0, timeout - 1.0),
+        )
+        return await asyncio.wait_for(fut, timeout=timeout)
+    except asyncio.TimeoutError as e:
+        logger.warning("pdf_extract_timeout", size=len(data), timeout=timeout)
+        _discard_pool(pool)
+        raise UnsupportedContentError("PDF extraction timed out") from e
+    except BrokenProcessPool as e:
+        # 子进程崩溃（畸形 PDF / OOM）后池永久不可用：丢弃，下次重建
+        logger.warning("pdf_extract_pool_broken", size=len(data), error=str(e)[:200])
+        _discard_pool(pool)
+        raise UnsupportedContentError(f"PDF extraction failed: {str(e)[:200]}") from e
+    except Exception as e:
+        raise UnsupportedContentError(f"PDF extraction failed: {str(e)[:200]}") from e
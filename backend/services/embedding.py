@@ -1,56 +1,231 @@
-"""Gemini embedding service: single and batch embed with configurable model/dimension."""
+"""Embedding service: single and batch embed through the configured provider (embedding_providers), with a persistent cache and micro-batching."""
 from __future__ import annotations
 
 import asyncio
-from typing import List
+from typing import List, Optional
 
 import httpx
+import numpy as np
 from backend.core.config import get_settings
 from backend.core.logging_config import get_logger
+from backend.services.embedding_cache import embedding_key, get_embedding_cache
+from backend.services.embedding_providers import Vector, get_embedding_provider
 
 logger = get_logger(__name__)
 
-GEMINI_EMBED_URL_TEMPLATE = "https://generativelanguage.googleapis.com/v1beta/models/{model}:embedContent"
+_RETRY_STATUS = (429, 500, 502, 503, 504)
 
 
-async def embed_text(text: str) -> List[float]:
-    """Embed a single text; returns vector of length EMBEDDING_DIMENSION."""
+def _split_batches(texts: List[str], max_items: int, max_chars: int) -> List[List[int]]:
+    """Group indices into consecutive batches within the per-request item and size limits."""
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_chars = 0
+    for i, t in enumerate(texts):
+        n = len(t)
+        if cur and (len(cur) >= max_items or cur_chars + n > max_chars):
+            batches.append(cur)
+            cur, cur_chars = [], 0
+        cur.append(i)
+        cur_chars += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+async def _embed_batch(texts: List[str], task_type: Optional[str], attempt: int = 0) -> List[Vector]:
+    """
+    Embed one batch, retrying only what failed: transient HTTP errors (429 / 5xx / network) retry the batch
+    with backoff; a 400 splits the batch to isolate the bad item, which then gets an empty vector (dropped
+    downstream) instead of failing the call; entries missing from a successful response are re-requested
+    on their own.
+    """
     settings = get_settings()
-    url = GEMINI_EMBED_URL_TEMPLATE.format(model=settings.EMBEDDING_MODEL)
-    payload = {"content": {"parts": [{"text": text}]}}
-    headers = {"Content-Type": "application/json", "x-goog-api-key": settings.GEMINI_API_KEY}
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        resp = await client.post(url, json=payload, headers=headers)
-        resp.raise_for_status()
-    data = resp.json()
-    values = (data.get("embedding") or {}).get("values") or []
-    if len(values) != settings.EMBEDDING_DIMENSION:
+    try:
+        results = await get_embedding_provider().embed_batch(texts, task_type)
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code
+        if status == 400 and len(texts) > 1:
+            mid = len(texts) // 2
+            left, right = await asyncio.gather(
+                _embed_batch(texts[:mid], task_type), _embed_batch(texts[mid:], task_type)
+            )
+            return left + right
+        if status == 400:
+            logger.warning(
+                "embed_item_rejected", chars=len(texts[0]), preview=texts[0][:80], error=e.response.text[:200]
+            )
+            return [np.zeros(0, dtype=np.float32)]
+        if status not in _RETRY_STATUS or attempt >= settings.EMBED_BATCH_MAX_RETRIES:
+            raise
+        logger.info("embed_batch_retry", size=len(texts), status=status, attempt=attempt + 1)
+        await asyncio.sleep(0.5 * (2**attempt))
+        return await _embed_batch(texts, task_type, attempt + 1)
+    except httpx.TransportError as e:
+        if attempt >= settings.EMBED_BATCH_MAX_RETRIES:
+            raise
+        logger.info("embed_batch_retry", size=len(texts), error=str(e)[:200], attempt=attempt + 1)
+        await asyncio.sleep(0.5 * (2**attempt))
+        return await _embed_batch(texts, task_type, attempt + 1)
+
+    missing = [i for i, v in enumerate(results) if v is None]
+    if missing:
+        if attempt >= settings.EMBED_BATCH_MAX_RETRIES:
+            raise RuntimeError(f"Batch embedding returned no vector for {len(missing)} item(s)")
+        logger.info("embed_batch_partial", size=len(texts), missing=len(missing))
+        retried = await _embed_batch([texts[i] for i in missing], task_type, attempt + 1)
+        for i, vec in zip(missing, retried):
+            results[i] = vec
+    return [v if v is not None else np.zeros(0, dtype=np.float32) for v in results]
+
+
+async def embed_text(text: str, task_type: Optional[str] = None) -> Vector:
+    """Embed a single text; returns a float32 vector of the provider's dimension."""
+    return (await embed_texts([text], task_type=task_type))[0]
+
+
+async def _embed_uncached(texts: List[str], task_type: Optional[str]) -> List[Vector]:
+    """Split at the provider's batch size / EMBED_BATCH_MAX_CHARS, run batches concurrently, keep input order."""
+    settings = get_settings()
+    provider = get_embedding_provider()
+    batches = _split_batches(texts, provider.max_batch_items, settings.EMBED_BATCH_MAX_CHARS)
+    sem = asyncio.Semaphore(max(1, settings.EMBED_BATCH_CONCURRENCY))
+
+    async def run(indices: List[int]) -> List[Vector]:
+        async with sem:
+            return await _embed_batch([texts[i] for i in indices], task_type)
+
+    results: List[Vector] = [np.zeros(0, dtype=np.float32)] * len(texts)
+    for indices, vectors in zip(batches, await asyncio.gather(*[run(b) for b in batches])):
+        for i, vec in zip(indices, vectors):
+            results[i] = vec
+    got = next((v.shape[0] for v in results if v.size), provider.dimension)  # 被拒条目是空向量，不算维度不符
+    if got != provider.dimension:
         logger.warning(
             "embedding_dimension_mismatch",
-            expected=settings.EMBEDDING_DIMENSION,
-            got=len(values),
+            provider=provider.name,
+            expected=provider.dimension,
+            got=got,
         )
-    return [float(x) for x in values]
+    return results
 
 
-async def embed_texts(texts: List[str]) -> List[List[float]]:
-    """Embed multiple texts in one batch request when API supports it; else concurrent single requests."""
+async def embed_texts(texts: List[str], task_type: Optional[str] = None) -> List[Vector]:
+    """
+    Embed multiple texts into float32 arrays; result order matches `texts`. Cached vectors (same model, dimension, task type and
+    text hash) are reused without a request; the remaining distinct texts go to the provider in batches, through the
+    micro-batching dispatcher when enabled, so misses from concurrent requests share batch requests.
+    `task_type` is passed to Gemini as taskType (e.g. RETRIEVAL_QUERY) when set; local backends ignore it.
+    """
     if not texts:
         return []
     settings = get_settings()
-    url = GEMINI_EMBED_URL_TEMPLATE.format(model=settings.EMBEDDING_MODEL)
-    headers = {"Content-Type": "application/json", "x-goog-api-key": settings.GEMINI_API_KEY}
-
-    # Batch embed: single request with multiple contents (if supported)
-    # Gemini embedContent accepts one content; for multiple we do concurrent requests
-    async def one(t: str) -> List[float]:
-        payload = {"content": {"parts": [{"text": t}]}}
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.post(url, json=payload, headers=headers)
-            resp.raise_for_status()
-        data = resp.json()
-        values = (data.get("embedding") or {}).get("values") or []
-        return [float(x) for x in values]
-
-    results = await asyncio.gather(*[one(t) for t in texts])
-    return list(results)
+    provider = get_embedding_provider()
+    keys = [embedding_key(provider.model_id, provider.dimension, task_type, t) for t in texts]
+    cache = get_embedding_cache() if settings.EMBED_CACHE_ENABLED else None
+    found = await cache.get_many(list(dict.fromkeys(keys))) if cache is not None else {}
+    vectors: dict[str, Vector] = dict(found)
+
+    # 未命中的文本去重后请求（同一文本只嵌入一次）
+    pending: dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors and key not in pending:
+            pending[key] = text
+    if pending:
+        if settings.EMBED_MICROBATCH_ENABLED:
+            fresh = await _get_dispatcher().embed_many(list(pending.values()), task_type)
+        else:
+            fresh = await _embed_uncached(list(pending.values()), task_type)
+        for key, vec in zip(pending, fresh):
+            vectors[key] = vec
+        if cache is not None:
+            await cache.set_many([(key, vec) for key, vec in zip(pending, fresh) if vec.size])
+    return [vectors[k] for k in keys]
+
+
+class EmbeddingDispatcher:
+    """
+    Collects the cache misses of embed_texts calls arriving within `max_wait` seconds (or until `max_size`
+    distinct texts) per task type into one provider call and hands each caller its vectors. Identical texts
+    in a window are embedded once. A failed batch fails every caller in it.
+    """
+
+    def __init__(self, max_wait: float, max_size: int):
+        self._max_wait = max_wait
+        self._max_size = max(1, max_size)
+        self._pending: dict[Optional[str], dict[str, list[asyncio.Future]]] = {}
+        self._timers: dict[Optional[str], asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._loop = asyncio.get_running_loop()
+        self.calls = 0
+        self.batches = 0
+        self.texts = 0
+
+    async def embed_many(self, texts: List[str], task_type: Optional[str] = None) -> List[Vector]:
+        futs = []
+        group = self._pending.setdefault(task_type, {})
+        for text in texts:
+            fut = self._loop.create_future()
+            group.setdefault(text, []).append(fut)
+            futs.append(fut)
+        self.calls += 1
+        # 整批加入后再判断：大提交（如整篇文档的段落）与窗口内的其他请求合成一次调用，不被拆成多个并发任务
+        if len(group) >= self._max_size:
+            self._flush(task_type)
+        elif task_type not in self._timers:
+            self._timers[task_type] = self._loop.call_later(self._max_wait, self._flush, task_type)
+        return list(await asyncio.gather(*futs))
+
+    def _flush(self, task_type: Optional[str]) -> None:
+        timer = self._timers.pop(task_type, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._pending.pop(task_type, None)
+        if not group:
+            return
+        task = self._loop.create_task(self._run(task_type, group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, task_type: Optional[str], group: dict[str, list[asyncio.Future]]) -> None:
+        texts = list(group)
+        self.batches += 1
+        self.texts += len(texts)
+        try:
+            vectors = await _embed_uncached(texts, task_type)
+        except Exception as e:
+            for futs in group.values():
+                for f in futs:
+                    if not f.done():
+                        f.set_exception(e)
+            return
+        for text, vec in zip(texts, vectors):
+            for f in group[text]:
+                if not f.done():  # 调用方可能已取消
+                    f.set_result(vec)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "calls": self.calls,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+_dispatcher: Optional[EmbeddingDispatcher] = None
+
+
+def _get_dispatcher() -> EmbeddingDispatcher:
+    """Singleton per event loop (futures and timers are bound to the loop that created them)."""
+    global _dispatcher
+    if _dispatcher is None or _dispatcher._loop is not asyncio.get_running_loop():
+        settings = get_settings()
+        _dispatcher = EmbeddingDispatcher(
+            settings.EMBED_MICROBATCH_MAX_WAIT_MS / 1000.0, settings.EMBED_MICROBATCH_MAX_SIZE
+        )
+    return _dispatcher
+
+
+def dispatcher_stats() -> dict[str, int | float]:
+    return _dispatcher.stats() if _dispatcher is not None else {}
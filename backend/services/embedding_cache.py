@@ -0,0 +1,191 @@
+"""Persistent embedding cache keyed by (model, dimension, task type, SHA-256 of text): LRU memory tier + SQLite float32 blobs."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from backend.core.config import get_settings
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_DISK_PRUNE_EVERY = 200  # 每 N 条写入检查一次容量，按 last_used 淘汰最久未用
+
+
+def _cache_db_path() -> Path:
+    base = os.environ.get("WISDOMPROMPT_DATA_DIR")
+    if base:
+        return Path(base) / "embedding_cache.sqlite3"
+    return Path(__file__).resolve().parents[2] / "data" / "embedding_cache.sqlite3"
+
+
+def embedding_key(model: str, dimension: int, task_type: Optional[str], text: str) -> str:
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}\x1f{dimension}\x1f{task_type or ''}\x1f{digest}"
+
+
+class _MemoryTier:
+    """Bounded LRU of float32 vectors (no TTL: an embedding of the same text under the same model never changes)."""
+
+    def __init__(self, max_entries: int):
+        self._data: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._max = max(1, max_entries)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        vec = self._data.get(key)
+        if vec is not None:
+            self._data.move_to_end(key)
+        return vec
+
+    def set(self, key: str, vec: np.ndarray) -> None:
+        self._data[key] = vec
+        self._data.move_to_end(key)
+        while len(self._data) > self._max:
+            self._data.popitem(last=False)
+
+
+class _DiskTier:
+    """SQLite (WAL) table of float32 blobs; shared by all workers, LRU by last_used."""
+
+    def __init__(self, path: Path, max_entries: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embedding_cache_last_used ON embedding_cache(last_used)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._max = max(1, max_entries)
+        self._writes = 0
+        self.evictions = 0
+
+    def get_many(self, keys: list[str], now: float) -> dict[str, np.ndarray]:
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embedding_cache WHERE key IN ({marks})", keys
+            ).fetchall()
+            if rows:
+                self._conn.execute(
+                    f"UPDATE embedding_cache SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                    (now, *[r[0] for r in rows]),
+                )
+                self._conn.commit()
+        return {r[0]: np.frombuffer(r[1], dtype=np.float32) for r in rows}
+
+    def set_many(self, items: list[tuple[str, np.ndarray]], now: float) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector, last_used) VALUES (?, ?, ?)",
+                [(k, np.ascontiguousarray(v, dtype=np.float32).tobytes(), now) for k, v in items],
+            )
+            before = self._writes
+            self._writes += len(items)
+            if self._writes // _DISK_PRUNE_EVERY != before // _DISK_PRUNE_EVERY:
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self) -> None:
+        cur = self._conn.execute(
+            "DELETE FROM embedding_cache WHERE key IN ("
+            " SELECT key FROM embedding_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self._max,),
+        )
+        self.evictions += cur.rowcount
+
+    def size(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT count(*) FROM embedding_cache").fetchone()[0])
+
+
+class EmbeddingCache:
+    """Memory tier in front of an optional disk tier; a hit in either means no embedding request."""
+
+    def __init__(self, disk_path: Optional[Path] = None):
+        settings = get_settings()
+        self._memory = _MemoryTier(settings.EMBED_CACHE_MEMORY_ENTRIES)
+        self._disk: Optional[_DiskTier] = None
+        if settings.EMBED_CACHE_DISK_ENABLED:
+            try:
+                self._disk = _DiskTier(disk_path or _cache_db_path(), settings.EMBED_CACHE_DISK_MAX_ENTRIES)
+            except Exception as e:
+                logger.warning("embedding_cache_disk_unavailable", error=str(e))
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "disk_errors": 0}
+
+    async def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        for key in keys:
+            vec = self._memory.get(key)
+            if vec is not None:
+                found[key] = vec
+        self._stats["memory_hits"] += len(found)
+        rest = [k for k in keys if k not in found]
+        if rest and self._disk is not None:
+            try:
+                disk = await asyncio.to_thread(self._disk.get_many, rest, time.time())
+            except Exception as e:
+                disk = {}
+                self._stats["disk_errors"] += 1
+                logger.warning("embedding_cache_disk_get_failed", error=str(e))
+            for key, vec in disk.items():
+                self._memory.set(key, vec)
+                found[key] = vec
+            self._stats["disk_hits"] += len(disk)
+        self._stats["misses"] += len(keys) - len(found)
+        return found
+
+    async def set_many(self, items: list[tuple[str, np.ndarray]]) -> None:
+        if not items:
+            return
+        for key, vec in items:
+            self._memory.set(key, vec)
+        self._stats["sets"] += len(items)
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.set_many, items, time.time())
+            except Exception as e:
+                self._stats["disk_errors"] += 1
+                logger.warning("embedding_cache_disk_set_failed", error=str(e))
+
+    def stats(self) -> dict[str, int | float | bool]:
+        lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        out: dict[str, int | float | bool] = dict(self._stats)
+        out.update(
+            hit_rate=round(hits / lookups, 4) if lookups else 0.0,
+            memory_size=len(self._memory),
+            disk_enabled=self._disk is not None,
+        )
+        if self._disk is not None:
+            try:
+                out.update(disk_size=self._disk.size(), disk_evictions=self._disk.evictions)
+            except Exception:
+                pass
+        return out
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Singleton embedding cache (one memory tier per process; disk tier shared)."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
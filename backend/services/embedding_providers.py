@@ -0,0 +1,213 @@
+"""Embedding providers selected by EMBEDDING_PROVIDER: Gemini (remote), local sentence-transformers (CPU), hashing (deterministic, offline)."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import re
+import threading
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+from backend.core.config import EmbeddingProviderName, get_settings
+from backend.core.logging_config import get_logger
+from backend.services.http_client import get_http_client
+from backend.services.rate_limit import get_rate_limiter
+
+logger = get_logger(__name__)
+
+GEMINI_BATCH_EMBED_URL_TEMPLATE = "https://generativelanguage.googleapis.com/v1beta/models/{model}:batchEmbedContents"
+
+_GEMINI_TIMEOUT = 30.0
+
+Vector = np.ndarray  # float32, shape (dimension,)
+
+
+class EmbeddingProvider:
+    """
+    One embedding backend. `model_id` + `dimension` identify the vector space: caches and the vector store
+    key on them so vectors from different backends never mix.
+    """
+
+    name: str = ""
+
+    @property
+    def model_id(self) -> str:
+        raise NotImplementedError
+
+    @property
+    def dimension(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def max_batch_items(self) -> int:
+        return get_settings().EMBED_BATCH_MAX_ITEMS
+
+    async def embed_batch(self, texts: List[str], task_type: Optional[str]) -> List[Optional[Vector]]:
+        """Embed one batch (already within limits) as float32 arrays; an entry is None when the backend returned no vector."""
+        raise NotImplementedError
+
+
+_PROVIDERS: dict[str, type[EmbeddingProvider]] = {}
+
+
+def register_provider(name: str) -> Callable[[type[EmbeddingProvider]], type[EmbeddingProvider]]:
+    def deco(cls: type[EmbeddingProvider]) -> type[EmbeddingProvider]:
+        cls.name = name
+        _PROVIDERS[name] = cls
+        return cls
+
+    return deco
+
+
+@register_provider("gemini")
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    @property
+    def model_id(self) -> str:
+        return get_settings().EMBEDDING_MODEL
+
+    @property
+    def dimension(self) -> int:
+        return get_settings().EMBEDDING_DIMENSION
+
+    async def embed_batch(self, texts: List[str], task_type: Optional[str]) -> List[Optional[Vector]]:
+        settings = get_settings()
+        model = settings.EMBEDDING_MODEL
+        if not await get_rate_limiter().acquire(
+            "gemini_embed", settings.EMBED_RATE_LIMIT_MAX_WAIT, units=len(texts)
+        ):
+            raise RuntimeError("Gemini embedding rate limit / monthly quota exhausted")
+        url = GEMINI_BATCH_EMBED_URL_TEMPLATE.format(model=model)
+        requests = []
+        for t in texts:
+            item: dict = {
+                "model": f"models/{model}",
+                "content": {"parts": [{"text": t}]},
+                # Matryoshka：维度小于模型原生维度时由 API 截断
+                "outputDimensionality": settings.EMBEDDING_DIMENSION,
+            }
+            if task_type:
+                item["taskType"] = task_type
+            requests.append(item)
+        payload = {"requests": requests}
+        headers = {"Content-Type": "application/json", "x-goog-api-key": settings.GEMINI_API_KEY}
+        resp = await get_http_client().post(url, json=payload, headers=headers, timeout=_GEMINI_TIMEOUT)
+        resp.raise_for_status()
+        embeddings = resp.json().get("embeddings") or []
+        out: List[Optional[Vector]] = []
+        for i in range(len(texts)):
+            values = (embeddings[i] or {}).get("values") if i < len(embeddings) else None
+            # JSON 解码后直接转 float32 数组，之后不再经过 Python float 列表
+            out.append(np.asarray(values, dtype=np.float32) if values else None)
+        return out
+
+
+@register_provider("local")
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """sentence-transformers on CPU (optionally the ONNX backend); the model is loaded on first use, off the event loop."""
+
+    def __init__(self) -> None:
+        self._model: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        return get_settings().LOCAL_EMBEDDING_MODEL
+
+    @property
+    def dimension(self) -> int:
+        return get_settings().LOCAL_EMBEDDING_DIMENSION
+
+    @property
+    def max_batch_items(self) -> int:
+        return get_settings().LOCAL_EMBEDDING_BATCH_SIZE
+
+    def _load(self) -> Any:
+        with self._lock:
+            if self._model is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise RuntimeError(
+                        "sentence-transformers not installed; pip install sentence-transformers (or onnxruntime for the ONNX backend)"
+                    ) from e
+                settings = get_settings()
+                kwargs: dict[str, Any] = {"device": "cpu"}
+                if settings.LOCAL_EMBEDDING_BACKEND == "onnx":
+                    kwargs["backend"] = "onnx"
+                model = SentenceTransformer(settings.LOCAL_EMBEDDING_MODEL, **kwargs)
+                native = model.get_sentence_embedding_dimension()
+                dim = settings.LOCAL_EMBEDDING_DIMENSION
+                if dim > native:
+                    raise RuntimeError(
+                        f"LOCAL_EMBEDDING_DIMENSION={dim} but {settings.LOCAL_EMBEDDING_MODEL} outputs {native}"
+                    )
+                if dim < native:
+                    # Matryoshka 截断（归一化在截断之后做）；只对按 MRL 训练的模型有意义
+                    model.truncate_dim = dim
+                logger.info(
+                    "local_embedding_model_loaded", model=settings.LOCAL_EMBEDDING_MODEL, dimension=dim, native=native
+                )
+                self._model = model
+            return self._model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        model = self._load()
+        vectors = model.encode(texts, batch_size=len(texts), normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.astype(np.float32, copy=False)
+
+    async def embed_batch(self, texts: List[str], task_type: Optional[str]) -> List[Optional[Vector]]:
+        return list(await asyncio.to_thread(self._encode, texts))
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CJK = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")
+
+
+@register_provider("hashing")
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Feature hashing of word tokens and CJK character bigrams into a signed, L2-normalized vector.
+    Deterministic and dependency-free: meant for tests and air-gapped runs, not for retrieval quality.
+    """
+
+    @property
+    def model_id(self) -> str:
+        return "hashing-v1"
+
+    @property
+    def dimension(self) -> int:
+        return get_settings().HASHING_EMBEDDING_DIMENSION
+
+    def _embed_one(self, text: str) -> Vector:
+        dim = self.dimension
+        vec = np.zeros(dim, dtype=np.float32)
+        lowered = text.lower()
+        tokens = _WORD.findall(lowered)
+        for run in _CJK.findall(lowered):
+            tokens.extend(run[i : i + 2] for i in range(max(1, len(run) - 1)))
+        for tok in tokens:
+            h = int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    async def embed_batch(self, texts: List[str], task_type: Optional[str]) -> List[Optional[Vector]]:
+        return [self._embed_one(t) for t in texts]
+
+
+_provider: Optional[EmbeddingProvider] = None
+
+
+def provider_names() -> list[str]:
+    return list(_PROVIDERS)
+
+
+def get_embedding_provider(name: Optional[EmbeddingProviderName] = None) -> EmbeddingProvider:
+    """The provider chosen by EMBEDDING_PROVIDER (singleton), or a fresh instance of `name`."""
+    global _provider
+    if name is not None:
+        return _PROVIDERS[name]()
+    if _provider is None:
+        _provider = _PROVIDERS[get_settings().EMBEDDING_PROVIDER]()
+    return _provider
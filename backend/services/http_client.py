@@ -0,0 +1,26 @@
+"""Shared httpx AsyncClient for provider APIs: one connection pool with keep-alive instead of a client per call."""
+from __future__ import annotations
+
+from typing import Optional
+
+import httpx
+
+_DEFAULT_TIMEOUT = 30.0
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide client; per-call timeouts can still be passed to .get()/.post()."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=_DEFAULT_TIMEOUT, limits=_LIMITS)
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,155 @@
+"""Document ingestion: split into overlapping token-sized passages, embed them in batches, store as child rows of one document."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from backend.core.config import get_settings
+from backend.core.logging_config import get_logger
+from backend.services import embedding, vector_store
+
+logger = get_logger(__name__)
+
+# CJK / 假名 / 谚文按 1 字 ≈ 1 token，其余按 4 字符 ≈ 1 token
+_CJK_CHAR = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+_KANA = re.compile(r"[\u3040-\u30ff]")
+_HANGUL = re.compile(r"[\uac00-\ud7af]")
+_HAN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]")
+_CYRILLIC = re.compile(r"[\u0400-\u04ff]")
+_LATIN = re.compile(r"[A-Za-z\u00c0-\u024f]")
+_NON_ASCII_LATIN = re.compile(r"[\u00c0-\u024f]")
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"(?<=[。！？；!?;])|(?<=[.])(?=\s)")
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = len(_CJK_CHAR.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def detect_language(text: str, sample_chars: int = 4000) -> Optional[str]:
+    """
+    Coarse language tag from the script mix of a sample: ja / ko / zh / ru, en for Latin text without accented
+    letters; None when it cannot tell (other scripts, accented Latin). Good enough for a search filter.
+    """
+    sample = text[:sample_chars]
+    han = len(_HAN.findall(sample))
+    kana = len(_KANA.findall(sample))
+    hangul = len(_HANGUL.findall(sample))
+    cyrillic = len(_CYRILLIC.findall(sample))
+    latin = len(_LATIN.findall(sample))
+    letters = han + kana + hangul + cyrillic + latin
+    if not letters:
+        return None
+    # 日文正文里汉字常多于假名，所以假名占比不低就判 ja
+    if kana and kana * 5 >= han + kana:
+        return "ja"
+    if hangul * 2 >= letters:
+        return "ko"
+    if (han + kana) * 5 >= letters:
+        return "zh"
+    if cyrillic * 2 >= letters:
+        return "ru"
+    if latin * 2 >= letters and len(_NON_ASCII_LATIN.findall(sample)) * 100 < latin:
+        return "en"
+    return None
+
+
+def _hard_split(text: str, max_tokens: int) -> list[str]:
+    """Last resort for a sentence longer than a passage: cut by characters."""
+    out: list[str] = []
+    step = max(1, max_tokens)  # CJK 最坏情况 1 字 1 token
+    if not _CJK_CHAR.search(text):
+        step = max_tokens * 4
+    for i in range(0, len(text), step):
+        out.append(text[i : i + step])
+    return out
+
+
+def _units(text: str, max_tokens: int) -> list[tuple[str, int]]:
+    """Sentences (paragraph breaks kept on the last sentence of each paragraph); over-long sentences are cut."""
+    units: list[tuple[str, int]] = []
+    for para in _PARAGRAPH.split(text):
+        para = para.strip()
+        if not para:
+            continue
+        for sentence in _SENTENCE.split(para):
+            if not sentence.strip():
+                continue
+            pieces = [sentence] if estimate_tokens(sentence) <= max_tokens else _hard_split(sentence, max_tokens)
+            units.extend((p, estimate_tokens(p)) for p in pieces)
+        units[-1] = (units[-1][0] + "\n\n", units[-1][1])
+    return units
+
+
+def split_passages(text: str, max_tokens: int, overlap_tokens: int) -> list[str]:
+    """
+    Greedily pack sentences into passages of at most `max_tokens`;
+    each passage starts with up to `overlap_tokens` of the previous passage's tail.
+    """
+    passages: list[str] = []
+    cur: list[tuple[str, int]] = []
+    cur_tokens = 0
+    for unit, tokens in _units(text, max_tokens):
+        if cur and cur_tokens + tokens > max_tokens:
+            passages.append("".join(u for u, _ in cur).strip())
+            carry: list[tuple[str, int]] = []
+            carry_tokens = 0
+            for u, t in reversed(cur):
+                if carry_tokens + t > overlap_tokens:
+                    break
+                carry.insert(0, (u, t))
+                carry_tokens += t
+            if carry_tokens + tokens > max_tokens:
+                carry, carry_tokens = [], 0
+            cur, cur_tokens = carry, carry_tokens
+        cur.append((unit, tokens))
+        cur_tokens += tokens
+    if cur:
+        passages.append("".join(u for u, _ in cur).strip())
+    return [p for p in passages if p]
+
+
+@dataclass
+class IngestedDocument:
+    passages: list[str]
+    embeddings: np.ndarray  # float32, (len(passages), dimension)
+
+
+async def ingest_document(
+    content: str, url: Optional[str], source: str, content_type: Optional[str] = None
+) -> IngestedDocument:
+    """Split, embed (one batch call) and store a document with its passages and metadata (content type,
+    detected language); returns them for immediate ranking."""
+    settings = get_settings()
+    content = content[: settings.DOCUMENT_MAX_CHARS]
+    passages = split_passages(content, settings.PASSAGE_MAX_TOKENS, settings.PASSAGE_OVERLAP_TOKENS)
+    passages = passages[: settings.DOCUMENT_MAX_PASSAGES]
+    if not passages:
+        return IngestedDocument([], np.zeros((0, 0), dtype=np.float32))
+    embedded = await embedding.embed_texts(passages)
+    # 被 provider 拒绝的段落拿到空向量，不入库
+    kept = [(p, v) for p, v in zip(passages, embedded) if v.size]
+    if not kept:
+        return IngestedDocument([], np.zeros((0, 0), dtype=np.float32))
+    passages = [p for p, _ in kept]
+    vectors = np.stack([v for _, v in kept])
+    await vector_store.get_vector_store().add_document(
+        content, url, source, passages, vectors, content_type=content_type, language=detect_language(content)
+    )
+    logger.debug("document_ingested", url=(url or "")[:80], passages=len(passages))
+    return IngestedDocument(passages, vectors)
+
+
+def best_passages(doc: IngestedDocument, query_embedding: np.ndarray, k: int) -> list[tuple[str, float]]:
+    """Top-k passages by cosine similarity to the query, returned in document order."""
+    if not doc.passages:
+        return []
+    q = np.asarray(query_embedding, dtype=np.float32)
+    norms = np.linalg.norm(doc.embeddings, axis=1) * (float(np.linalg.norm(q)) or 1.0)
+    sims = (doc.embeddings @ q) / np.where(norms > 0, norms, 1.0)
+    top = sorted(np.argsort(-sims)[:k])
+    return [(doc.passages[i], float(sims[i])) for i in top]
@@ -0,0 +1,193 @@
+"""Proactive rate limiting per provider: token bucket (requests/second) + monthly quota shared via SQLite."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+from backend.core.config import get_settings
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def _quota_db_path() -> Path:
+    base = os.environ.get("WISDOMPROMPT_DATA_DIR")
+    if base:
+        return Path(base) / "provider_quota.sqlite3"
+    return Path(__file__).resolve().parents[2] / "data" / "provider_quota.sqlite3"
+
+
+class TokenBucket:
+    """Async token bucket. Waiters reserve a token (balance may go negative) and sleep until it refills,
+    so queued callers are served in arrival order without busy polling."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, max_wait: float) -> bool:
+        """Take one token, waiting at most `max_wait` seconds; False if that is not enough."""
+        async with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                return False
+            self._tokens -= 1
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # 排队中被取消（如对冲已有结果）：预留的令牌没用上，退回
+                self.release()
+                raise
+        return True
+
+    def release(self) -> None:
+        """Give back a token that was taken but not spent (the call was refused further down)."""
+        self._refill(time.monotonic())
+        self._tokens = min(self.capacity, self._tokens + 1)
+
+
+class _MonthlyQuota:
+    """Per-provider monthly request counter; the increment is conditional so workers cannot overshoot."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS quota_usage ("
+            " provider TEXT NOT NULL, month TEXT NOT NULL, used INTEGER NOT NULL, PRIMARY KEY (provider, month))"
+        )
+        self._lock = threading.Lock()
+
+    def consume(self, provider: str, units: int, limit: int) -> bool:
+        month = date.today().strftime("%Y-%m")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO quota_usage (provider, month, used) VALUES (?, ?, 0)", (provider, month)
+            )
+            cur = self._conn.execute(
+                "UPDATE quota_usage SET used = used + ? WHERE provider = ? AND month = ? AND used + ? <= ?",
+                (units, provider, month, units, limit),
+            )
+        return cur.rowcount == 1
+
+    def refund(self, provider: str, units: int) -> None:
+        month = date.today().strftime("%Y-%m")
+        with self._lock:
+            self._conn.execute(
+                "UPDATE quota_usage SET used = max(0, used - ?) WHERE provider = ? AND month = ?",
+                (units, provider, month),
+            )
+
+    def usage(self) -> dict[str, int]:
+        month = date.today().strftime("%Y-%m")
+        with self._lock:
+            rows = self._conn.execute("SELECT provider, used FROM quota_usage WHERE month = ?", (month,)).fetchall()
+        return {p: int(u) for p, u in rows}
+
+
+@dataclass(frozen=True)
+class _Limit:
+    rate: float  # requests per second, per worker; 0 = unlimited
+    monthly_quota: int  # requests per calendar month, all workers; 0 = unlimited
+
+
+def _limits() -> dict[str, _Limit]:
+    s = get_settings()
+    return {
+        "brave": _Limit(s.BRAVE_RATE_PER_SECOND, s.BRAVE_MONTHLY_QUOTA),
+        "serper": _Limit(s.SERPER_RATE_PER_SECOND, s.SERPER_MONTHLY_QUOTA),
+        "exa": _Limit(s.EXA_RATE_PER_SECOND, s.EXA_MONTHLY_QUOTA),
+        "gemini_embed": _Limit(s.GEMINI_EMBED_RATE_PER_SECOND, s.GEMINI_EMBED_MONTHLY_QUOTA),
+    }
+
+
+class RateLimiter:
+    def __init__(self) -> None:
+        self._limits = _limits()
+        self._buckets = {
+            name: TokenBucket(limit.rate) for name, limit in self._limits.items() if limit.rate > 0
+        }
+        self._quota: Optional[_MonthlyQuota] = None
+        if any(limit.monthly_quota > 0 for limit in self._limits.values()):
+            self._quota = _MonthlyQuota(_quota_db_path())
+        self._rejected: dict[str, int] = {}
+
+    async def acquire(self, provider: str, max_wait: float, units: int = 1) -> bool:
+        """One request slot for `provider` (waiting up to max_wait); `units` is what the call bills
+        against the monthly quota (e.g. queries in a batch). False means: reroute or give up."""
+        bucket = self._buckets.get(provider)
+        if bucket is not None and not await bucket.acquire(max_wait):
+            self._rejected[provider] = self._rejected.get(provider, 0) + 1
+            return False
+        limit = self._limits.get(provider)
+        if limit and limit.monthly_quota > 0 and self._quota is not None:
+            try:
+                ok = await asyncio.to_thread(self._quota.consume, provider, units, limit.monthly_quota)
+            except BaseException:
+                if bucket is not None:
+                    bucket.release()
+                raise
+            if not ok:
+                if bucket is not None:
+                    bucket.release()  # 配额拒绝：请求不会发出，令牌退回
+                self._rejected[provider] = self._rejected.get(provider, 0) + 1
+                logger.warning("provider_monthly_quota_exhausted", provider=provider)
+                return False
+        return True
+
+    async def release(self, provider: str, units: int = 1, quota: bool = True) -> None:
+        """Undo a successful acquire whose request was never sent (e.g. the circuit refused it). With
+        quota=False only the token is returned (a cancelled request may already have reached the provider)."""
+        bucket = self._buckets.get(provider)
+        if bucket is not None:
+            bucket.release()
+        limit = self._limits.get(provider)
+        if quota and limit and limit.monthly_quota > 0 and self._quota is not None:
+            await asyncio.to_thread(self._quota.refund, provider, units)
+
+    def batch_wait(self, provider: str, n: int) -> float:
+        """Seconds the token bucket needs to admit `n` requests back to back (0 when unlimited)."""
+        bucket = self._buckets.get(provider)
+        return n / bucket.rate if bucket is not None else 0.0
+
+    def stats(self) -> dict[str, dict]:
+        usage = self._quota.usage() if self._quota is not None else {}
+        return {
+            name: {
+                "rate_per_second": limit.rate,
+                "monthly_quota": limit.monthly_quota,
+                "monthly_used": usage.get(name, 0),
+                "rejected": self._rejected.get(name, 0),
+            }
+            for name, limit in self._limits.items()
+        }
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Singleton limiter (buckets per worker, monthly quota shared)."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -5,21 +5,24 @@ from __future__ import annotations
 import asyncio
 from dataclasses import dataclass
 import time
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional, Sequence
 
 import httpx
 from backend.core.config import get_settings
 from backend.core.logging_config import get_logger
+from backend.services.circuit_breaker import HALF_OPEN, get_circuit_breaker
+from backend.services.http_client import get_http_client
+from backend.services.rate_limit import get_rate_limiter
+from backend.services.search_cache import get_search_cache, get_semantic_cache
+from backend.services.url_canon import canonicalize_url
 
 if TYPE_CHECKING:
+    import numpy as np
     from backend.core.config import Settings
 
 logger = get_logger(__name__)
 
-_CACHE_TTL_SECONDS = 300
-_CACHE: dict[tuple[str, int], tuple[float, list[dict[str, str]]]] = {}
-
-_COOLDOWN_SECONDS = 900
+_PROVIDER_TIMEOUT = 30.0
 
 
 @dataclass
@@ -27,7 +30,6 @@ class _ProviderStats:
     success: int = 0
     failure: int = 0
     avg_latency: float = 0.0
-    cooldown_until: float = 0.0
 
 
 _PROVIDER_STATS: dict[str, _ProviderStats] = {
@@ -37,25 +39,6 @@ _PROVIDER_STATS: dict[str, _ProviderStats] = {
 }
 
 
-def _now() -> float:
-    return time.time()
-
-
-def _cache_get(key: tuple[str, int]) -> list[dict[str, str]] | None:
-    entry = _CACHE.get(key)
-    if not entry:
-        return None
-    ts, data = entry
-    if _now() - ts > _CACHE_TTL_SECONDS:
-        _ = _CACHE.pop(key, None)
-        return None
-    return data
-
-
-def _cache_set(key: tuple[str, int], data: list[dict[str, str]]) -> None:
-    _CACHE[key] = (_now(), data)
-
-
 def _is_rate_limit_error(exc: Exception) -> bool:
     if isinstance(exc, httpx.HTTPStatusError):
         status = exc.response.status_code
@@ -64,20 +47,32 @@ def _is_rate_limit_error(exc: Exception) -> bool:
     return "429" in str(exc)
 
 
-def _mark_success(provider: str, latency: float) -> None:
+def _observe_latency(provider: str, latency: float) -> None:
     stats = _PROVIDER_STATS[provider]
-    stats.success += 1
     if stats.avg_latency == 0.0:
         stats.avg_latency = latency
     else:
         stats.avg_latency = stats.avg_latency * 0.7 + latency * 0.3
 
 
-def _mark_failure(provider: str, rate_limited: bool) -> None:
-    stats = _PROVIDER_STATS[provider]
-    stats.failure += 1
-    if rate_limited:
-        stats.cooldown_until = max(stats.cooldown_until, _now() + _COOLDOWN_SECONDS)
+# 熔断器读写 SQLite（可能等待其他 worker 的写锁），一律放到线程里，不阻塞事件循环
+async def _mark_success(provider: str, latency: float) -> None:
+    _PROVIDER_STATS[provider].success += 1
+    _observe_latency(provider, latency)
+    await asyncio.to_thread(get_circuit_breaker().record_success, provider)
+
+
+async def _mark_failure(provider: str, rate_limited: bool, error: str = "") -> None:
+    _PROVIDER_STATS[provider].failure += 1
+    await asyncio.to_thread(
+        get_circuit_breaker().record_failure, provider, rate_limited=rate_limited, error=error
+    )
+
+
+async def _mark_empty(provider: str) -> None:
+    """Empty result: lowers the provider score, but the provider answered, so the circuit stays healthy."""
+    _PROVIDER_STATS[provider].failure += 1
+    await asyncio.to_thread(get_circuit_breaker().record_success, provider)
 
 
 def _provider_score(provider: str) -> float:
@@ -88,21 +83,33 @@ def _provider_score(provider: str) -> float:
     return success_rate - latency_penalty
 
 
-def _provider_available(provider: str, settings: "Settings") -> bool:
-    stats = _PROVIDER_STATS[provider]
-    if stats.cooldown_until and stats.cooldown_until > _now():
-        return False
+async def _provider_available(provider: str, settings: "Settings") -> bool:
     if provider == "brave":
-        return bool(settings.BRAVE_API_KEY)
-    if provider == "serper":
-        return bool(settings.SERPER_API_KEY)
-    if provider == "exa":
-        return bool(settings.EXA_API_KEY)
-    return False
-
-
-def _normalize_hit(title: str, url: str, description: str) -> dict[str, str]:
-    return {"title": title or "", "url": url or "", "description": description or ""}
+        has_key = bool(settings.BRAVE_API_KEY)
+    elif provider == "serper":
+        has_key = bool(settings.SERPER_API_KEY)
+    elif provider == "exa":
+        has_key = bool(settings.EXA_API_KEY)
+    else:
+        has_key = False
+    return has_key and await asyncio.to_thread(get_circuit_breaker().is_callable, provider)
+
+
+def _normalize_hit(
+    title: str, url: str, description: str, content: str = ""
+) -> dict[str, str]:
+    # url 保留提供方原样（抓取、展示用）；canonical_url 只作去重键，同一页面在不同提供方 / 写法下只保留一份
+    url = url or ""
+    hit = {
+        "title": title or "",
+        "url": url,
+        "canonical_url": canonicalize_url(url),
+        "description": description or "",
+    }
+    if content:
+        # 提供方直接返回的正文（如 Exa contents），工作流据此跳过 fetch_content
+        hit["content"] = content
+    return hit
 
 
 async def _search_brave(query: str, count: int, api_key: str) -> list[dict[str, str]]:
@@ -112,9 +119,10 @@ async def _search_brave(query: str, count: int, api_key: str) -> list[dict[str,
     url = "https://api.search.brave.com/res/v1/web/search"
     headers = {"Accept": "application/json", "X-Subscription-Token": api_key}
     params = {"q": query, "count": count}
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        resp = await client.get(url, headers=headers, params=params)
-        resp.raise_for_status()
+    resp = await get_http_client().get(
+        url, headers=headers, params=params, timeout=_PROVIDER_TIMEOUT
+    )
+    resp.raise_for_status()
     data = resp.json()
     results = data.get("web", {}).get("results", [])
     return [
@@ -130,9 +138,10 @@ async def _search_serper(query: str, num: int, api_key: str) -> list[dict[str, s
     url = "https://google.serper.dev/search"
     headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
     payload = {"q": query, "num": num}
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        resp = await client.post(url, headers=headers, json=payload)
-        resp.raise_for_status()
+    resp = await get_http_client().post(
+        url, headers=headers, json=payload, timeout=_PROVIDER_TIMEOUT
+    )
+    resp.raise_for_status()
     data = resp.json()
     results = data.get("organic", [])
     return [
@@ -141,80 +150,413 @@ async def _search_serper(query: str, num: int, api_key: str) -> list[dict[str, s
     ]
 
 
-def _search_exa_sync(
-    query: str, num_results: int, api_key: str
-) -> list[dict[str, str]]:
-    try:
-        from exa_py import Exa
-    except ImportError:
-        logger.warning("exa_py_not_installed")
-        return []
+async def _search_serper_batch(
+    queries: list[str], num: int, api_key: str
+) -> list[list[dict[str, str]]]:
+    """Serper accepts a JSON array of queries in one POST and answers with an array in the same order."""
+    url = "https://google.serper.dev/search"
+    headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
+    payload = [{"q": q, "num": num} for q in queries]
+    resp = await get_http_client().post(
+        url, headers=headers, json=payload, timeout=_PROVIDER_TIMEOUT
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    if isinstance(data, dict):
+        data = [data]
+    out: list[list[dict[str, str]]] = []
+    for item in data[: len(queries)]:
+        results = item.get("organic", []) if isinstance(item, dict) else []
+        out.append(
+            [_normalize_hit(r.get("title", ""), r.get("link", ""), r.get("snippet", "")) for r in results]
+        )
+    out.extend([] for _ in range(len(queries) - len(out)))
+    return out
+
+
+async def _search_exa(query: str, count: int, api_key: str) -> list[dict[str, str]]:
     if not api_key:
         logger.warning("exa_search_no_api_key")
         return []
-    exa = Exa(api_key)
-    resp = exa.search(query, num_results=num_results)
-    results = getattr(resp, "results", []) or []
-    return [
-        _normalize_hit(
-            getattr(r, "title", "") or "",
-            getattr(r, "url", "") or "",
-            getattr(r, "text", "") or getattr(r, "description", "") or "",
+    settings = get_settings()
+    url = "https://api.exa.ai/search"
+    headers = {"x-api-key": api_key, "Content-Type": "application/json"}
+    payload: dict = {"query": query, "numResults": count}
+    if settings.EXA_CONTENTS_MAX_CHARS > 0:
+        payload["contents"] = {"text": {"maxCharacters": settings.EXA_CONTENTS_MAX_CHARS}}
+    resp = await get_http_client().post(
+        url, headers=headers, json=payload, timeout=_PROVIDER_TIMEOUT
+    )
+    resp.raise_for_status()
+    results = resp.json().get("results", []) or []
+    hits = []
+    for r in results:
+        text = (r.get("text") or "").strip()
+        hits.append(
+            _normalize_hit(
+                r.get("title", "") or "",
+                r.get("url", "") or "",
+                text[:300] or r.get("summary", "") or "",
+                text,
+            )
         )
-        for r in results
-    ]
+    return hits
 
 
-async def _search_exa(query: str, count: int, api_key: str) -> list[dict[str, str]]:
-    return await asyncio.to_thread(_search_exa_sync, query, count, api_key)
+async def _run_provider(
+    provider: str, query: str, count: int, settings: "Settings", batch: int = 0
+) -> list[dict[str, str]]:
+    """Call one provider, update _PROVIDER_STATS and its circuit; returns [] on failure, empty result,
+    open circuit or exhausted rate limit (the caller then moves on to the next provider).
+    `batch` > 0 marks the last provider that can take the query: instead of giving up after
+    RATE_LIMIT_MAX_WAIT it queues long enough for `batch` concurrent queries to each get a token."""
+    limiter = get_rate_limiter()
+    max_wait = settings.RATE_LIMIT_MAX_WAIT
+    if batch:
+        max_wait = max(max_wait, limiter.batch_wait(provider, batch))
+    if not await limiter.acquire(provider, max_wait):
+        if batch:
+            # 没有可改道的提供方，这条查询本次拿不到结果
+            logger.warning("search_skipped_rate_limited", provider=provider, query=query[:80], waited=round(max_wait, 2))
+        else:
+            logger.info("search_rate_limited_local", provider=provider, query=query[:80])
+        return []
+    lease = await asyncio.to_thread(get_circuit_breaker().acquire, provider)
+    if lease is None:
+        # 熔断拒绝时请求没发出去，令牌与月度配额退回
+        await limiter.release(provider)
+        return []
+    start = time.perf_counter()
+    try:
+        if provider == "brave":
+            out = await _search_brave(query, count, settings.BRAVE_API_KEY)
+        elif provider == "serper":
+            out = await _search_serper(query, count, settings.SERPER_API_KEY)
+        else:
+            out = await _search_exa(query, count, settings.EXA_API_KEY)
+        elapsed = time.perf_counter() - start
+        if out:
+            await _mark_success(provider, elapsed)
+            return out
+        await _mark_empty(provider)
+        logger.warning("search_returned_empty", provider=provider, query=query[:80])
+    except asyncio.CancelledError:
+        # 被对冲取消：已等待时长是延迟下界，计入平滑延迟，避免慢提供方的对冲延迟一直偏低
+        _observe_latency(provider, time.perf_counter() - start)
+        await _abandon_call(provider, lease)
+        raise
+    except Exception as exc:
+        await _mark_failure(provider, _is_rate_limit_error(exc), str(exc))
+        logger.warning(
+            "search_failed",
+            provider=provider,
+            error=str(exc)[:200],
+            query=query[:80],
+        )
+    return []
 
 
-async def search_web(query: str, count: int = 10) -> list[dict[str, str]]:
-    """Run web search using SEARCH_SOURCE (brave / exa / serper). Returns list of {title, url, description}. Fallback to serper/exa when brave key missing."""
-    settings = get_settings()
-    cache_key = (query, count)
-    cached = _cache_get(cache_key)
-    if cached is not None:
-        return cached
+async def _abandon_call(provider: str, lease: str, units: int = 1) -> None:
+    """A cancelled call reports no result: return its token and, if it was the half-open probe, the lease,
+    so the provider is probed again right away instead of after CIRCUIT_PROBE_TIMEOUT."""
+    # 月度配额不退：请求可能已到达提供方
+    await get_rate_limiter().release(provider, units, quota=False)
+    if lease == HALF_OPEN:
+        await asyncio.to_thread(get_circuit_breaker().release_probe, provider)
+
+
+def _hedge_delay(provider: str, settings: "Settings") -> float:
+    """Delay before hedging `provider` with the next one: ~1.5x its smoothed latency, clamped."""
+    avg = _PROVIDER_STATS[provider].avg_latency
+    if not avg:
+        return settings.SEARCH_HEDGE_MAX_DELAY
+    return min(max(avg * 1.5, settings.SEARCH_HEDGE_MIN_DELAY), settings.SEARCH_HEDGE_MAX_DELAY)
+
+
+def _rrf_merge(ranked_lists: list[list[dict[str, str]]], count: int, k: int = 60) -> list[dict[str, str]]:
+    """Reciprocal-rank fusion over provider result lists, dedup by canonical URL."""
+    scores: dict[str, float] = {}
+    hits: dict[str, dict[str, str]] = {}
+    for results in ranked_lists:
+        for rank, hit in enumerate(results):
+            url = hit.get("canonical_url") or hit.get("url") or ""
+            if not url:
+                continue
+            scores[url] = scores.get(url, 0.0) + 1.0 / (k + rank + 1)
+            if url not in hits or len(hit.get("description", "")) > len(hits[url].get("description", "")):
+                hits[url] = hit
+    ranked = sorted(scores, key=lambda u: -scores[u])
+    return [hits[u] for u in ranked[:count]]
+
+
+async def _search_hedged(
+    candidates: list[str], query: str, count: int, settings: "Settings", fusion: bool, batch: int = 1
+) -> tuple[str, list[dict[str, str]]]:
+    """
+    hedged: start the best provider; if it has not answered within its hedge delay (or fails / is empty),
+    start the next one in parallel; first non-empty answer wins and the rest are cancelled.
+    fusion: start the two best providers at once and RRF-merge; a straggler gets one hedge delay of grace
+    after the first non-empty answer, then is cancelled.
+    Returns (provider label for cache, hits).
+    """
+    queue = list(candidates)
+    pending: dict[asyncio.Task, str] = {}
+    answered: list[tuple[str, list[dict[str, str]]]] = []
+    width = 2 if fusion else 1
+
+    def launch() -> None:
+        provider = queue.pop(0)
+        last = batch if not queue else 0
+        pending[asyncio.create_task(_run_provider(provider, query, count, settings, last))] = provider
 
+    try:
+        while queue and len(pending) < width:
+            launch()
+        while pending:
+            if answered:
+                # fusion：已有结果，只给剩余请求一个对冲窗口
+                timeout = _hedge_delay(next(iter(pending.values())), settings)
+            elif queue and not fusion:
+                timeout = _hedge_delay(next(iter(pending.values())), settings)
+            else:
+                timeout = None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if answered:
+                    break
+                launch()
+                logger.info("search_hedge_fired", provider=pending[next(reversed(pending))], query=query[:80])
+                continue
+            for task in done:
+                provider = pending.pop(task)
+                out = task.result()
+                if out:
+                    answered.append((provider, out))
+                elif queue:
+                    launch()
+            if answered and not fusion:
+                return answered[0]
+            if fusion and len(answered) >= width:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+    if not answered:
+        return "", []
+    if len(answered) == 1:
+        return answered[0]
+    return "fusion", _rrf_merge([out for _, out in answered], count)
+
+
+def _provider_order(settings: "Settings") -> list[str]:
     source = settings.SEARCH_SOURCE
     order = ["brave", "serper", "exa"]
     if source in order:
         order.remove(source)
         order.insert(0, source)
+    return order
+
+
+def _cache_providers(order: list[str], settings: "Settings") -> list[str]:
+    return (["fusion"] if settings.SEARCH_MODE == "fusion" else []) + order
+
+
+def _cacheable(hits: list[dict[str, str]]) -> list[dict[str, str]]:
+    """Hits as stored in the caches: without provider-supplied page text (Exa contents, up to
+    EXA_CONTENTS_MAX_CHARS per hit), so cached queries stay small; a cache hit simply fetches the page."""
+    return [{k: v for k, v in hit.items() if k != "content"} if "content" in hit else hit for hit in hits]
 
-    candidates = [p for p in order if _provider_available(p, settings)]
+
+def _semantic_scope(order: list[str], settings: "Settings") -> str:
+    """Semantic cache entries are only reused under the same search mode and provider order."""
+    return f"{settings.SEARCH_MODE}\x1f{','.join(order)}"
+
+
+async def _ranked_candidates(order: list[str], settings: "Settings") -> list[str]:
+    """Providers with a key and a callable circuit, best score first (ties keep `order`)."""
+    available = await asyncio.gather(*[_provider_available(p, settings) for p in order])
+    candidates = [p for p, ok in zip(order, available) if ok]
+    candidates.sort(key=lambda p: (-_provider_score(p), order.index(p)))
+    return candidates
+
+
+async def _search_uncached(
+    query: str, count: int, settings: "Settings", order: list[str], batch: int = 1
+) -> list[dict[str, str]]:
+    """Provider failover for one query; `batch` is how many queries are sent alongside it (rate-limit wait bound)."""
+    candidates = await _ranked_candidates(order, settings)
     if not candidates:
         logger.warning("no_search_api_key")
         return []
 
-    candidates.sort(key=lambda p: (-_provider_score(p), order.index(p)))
+    cache = get_search_cache()
+    mode = settings.SEARCH_MODE
 
-    for candidate in candidates:
-        start = time.perf_counter()
-        try:
-            if candidate == "brave":
-                out = await _search_brave(query, count, settings.BRAVE_API_KEY)
-            elif candidate == "serper":
-                out = await _search_serper(query, count, settings.SERPER_API_KEY)
-            else:
-                out = await _search_exa(query, count, settings.EXA_API_KEY)
-            elapsed = time.perf_counter() - start
-            if out:
-                _mark_success(candidate, elapsed)
-                _cache_set(cache_key, out)
-                return out
-            _mark_failure(candidate, False)
-            logger.warning(
-                "search_returned_empty", provider=candidate, query=query[:80]
-            )
-        except Exception as exc:
-            _mark_failure(candidate, _is_rate_limit_error(exc))
-            logger.warning(
-                "search_failed",
-                provider=candidate,
-                error=str(exc)[:200],
-                query=query[:80],
-            )
+    if mode in ("hedged", "fusion") and len(candidates) > 1:
+        provider, out = await _search_hedged(
+            candidates, query, count, settings, fusion=mode == "fusion", batch=batch
+        )
+        if out:
+            await cache.set(provider, query, count, _cacheable(out))
+        return out
+
+    for n, candidate in enumerate(candidates, 1):
+        out = await _run_provider(candidate, query, count, settings, batch if n == len(candidates) else 0)
+        if out:
+            await cache.set(candidate, query, count, _cacheable(out))
+            return out
 
     return []
+
+
+async def _cached_lookup(
+    query: str,
+    count: int,
+    query_embedding: Optional["np.ndarray"],
+    settings: "Settings",
+    order: list[str],
+) -> Optional[list[dict[str, str]]]:
+    """Exact cache (normalized query) first, then the semantic cache when an embedding is given."""
+    cached = await get_search_cache().get(_cache_providers(order, settings), query, count)
+    if cached is not None:
+        return cached[1]
+    if query_embedding is not None and settings.SEARCH_SEMANTIC_CACHE_ENABLED:
+        near = get_semantic_cache().get(query_embedding, count, _semantic_scope(order, settings))
+        if near is not None:
+            logger.info("search_semantic_cache_hit", query=query[:80], matched=near[0][:80], similarity=round(near[1], 4))
+            return near[2]
+    return None
+
+
+def _semantic_remember(
+    query: str,
+    count: int,
+    query_embedding: Optional["np.ndarray"],
+    hits: list[dict[str, str]],
+    settings: "Settings",
+    order: list[str],
+) -> None:
+    if hits and query_embedding is not None and settings.SEARCH_SEMANTIC_CACHE_ENABLED:
+        get_semantic_cache().set(
+            query_embedding, query, count, _cacheable(hits), _semantic_scope(order, settings)
+        )
+
+
+async def search_web(
+    query: str, count: int = 10, query_embedding: Optional["np.ndarray"] = None
+) -> list[dict[str, str]]:
+    """Run web search using SEARCH_SOURCE (brave / exa / serper). Returns list of {title, url, description}.
+    SEARCH_MODE: sequential failover, hedged (parallel backup after a latency-based delay) or fusion (RRF over two providers).
+    With query_embedding, results of a near-identical earlier query (semantic cache) are reused."""
+    settings = get_settings()
+    order = _provider_order(settings)
+    cached = await _cached_lookup(query, count, query_embedding, settings, order)
+    if cached is not None:
+        return cached
+    out = await _search_uncached(query, count, settings, order)
+    _semantic_remember(query, count, query_embedding, out, settings, order)
+    return out
+
+
+async def _run_serper_batch(
+    queries: list[str], count: int, settings: "Settings"
+) -> Optional[list[list[dict[str, str]]]]:
+    """One Serper POST for all queries; updates serper stats. Returns None on failure or open circuit."""
+    limiter = get_rate_limiter()
+    if not await limiter.acquire("serper", settings.RATE_LIMIT_MAX_WAIT, units=len(queries)):
+        logger.info("search_rate_limited_local", provider="serper", n=len(queries))
+        return None
+    lease = await asyncio.to_thread(get_circuit_breaker().acquire, "serper")
+    if lease is None:
+        await limiter.release("serper", units=len(queries))
+        return None
+    start = time.perf_counter()
+    try:
+        out = await _search_serper_batch(queries, count, settings.SERPER_API_KEY)
+    except asyncio.CancelledError:
+        await _abandon_call("serper", lease, len(queries))
+        raise
+    except Exception as exc:
+        await _mark_failure("serper", _is_rate_limit_error(exc), str(exc))
+        logger.warning("search_batch_failed", provider="serper", n=len(queries), error=str(exc)[:200])
+        return None
+    await _mark_success("serper", time.perf_counter() - start)
+    return out
+
+
+async def search_web_many(
+    queries: list[str],
+    count: int = 10,
+    query_embeddings: Optional[Sequence["np.ndarray"]] = None,
+) -> list[list[dict[str, str]]]:
+    """
+    Search several queries at once; results are aligned with `queries` (and `query_embeddings`, if given).
+    Cache hits (exact, then semantic) are served first; remaining queries go to Serper's native batch endpoint in one POST when
+    Serper is the provider search_web would ask first (and SEARCH_MODE is not fusion), otherwise (or for queries the
+    batch left empty) through search_web's provider logic with bounded concurrency.
+    """
+    if not queries:
+        return []
+    settings = get_settings()
+    order = _provider_order(settings)
+    cache = get_search_cache()
+    embeds: list[Optional["np.ndarray"]] = (
+        list(query_embeddings) if query_embeddings is not None else [None] * len(queries)
+    )
+    cached = await asyncio.gather(
+        *[_cached_lookup(q, count, e, settings, order) for q, e in zip(queries, embeds)]
+    )
+    results: list[list[dict[str, str]]] = [c if c is not None else [] for c in cached]
+    misses = [i for i, c in enumerate(cached) if c is None]
+    fresh = list(misses)
+
+    fallback_order = order
+    # 只在 Serper 本来就是首选提供方时走批量；否则按 SEARCH_SOURCE / 评分 / SEARCH_MODE 逐条检索
+    use_batch = len(misses) > 1 and settings.SEARCH_MODE != "fusion"
+    if use_batch and (await _ranked_candidates(order, settings))[:1] == ["serper"]:
+        batch = await _run_serper_batch([queries[i] for i in misses], count, settings)
+        if batch is not None:
+            # 批量里为空的查询不再单独问 Serper
+            fallback_order = [p for p in order if p != "serper"]
+            for i, out in zip(misses, batch):
+                if out:
+                    results[i] = out
+                    await cache.set("serper", queries[i], count, _cacheable(out))
+            misses = [i for i in misses if not results[i]]
+            logger.info("search_batch_done", provider="serper", n=len(batch), n_empty=len(misses))
+
+    if misses:
+        sem = asyncio.Semaphore(max(1, settings.SEARCH_MANY_CONCURRENCY))
+
+        async def one(i: int) -> None:
+            async with sem:
+                results[i] = await _search_uncached(queries[i], count, settings, fallback_order, len(misses))
+
+        await asyncio.gather(*[one(i) for i in misses])
+    for i in fresh:
+        _semantic_remember(queries[i], count, embeds[i], results[i], settings, order)
+    return results
+
+
+def provider_health() -> dict:
+    """Circuit state (shared across workers), rate limit / quota usage and this worker's success/failure/latency stats."""
+    circuits = get_circuit_breaker().snapshot()
+    limits = get_rate_limiter().stats()
+    out = {}
+    for name, stats in _PROVIDER_STATS.items():
+        out[name] = {
+            "circuit": circuits.get(name, {"state": "closed"}),
+            "rate_limit": limits.get(name, {}),
+            "success": stats.success,
+            "failure": stats.failure,
+            "avg_latency": round(stats.avg_latency, 3),
+        }
+    return out
+
+
+def cache_stats() -> dict:
+    """Search cache statistics (memory / disk tiers, semantic cache) for the stats endpoint."""
+    out = get_search_cache().stats()
+    semantic = get_semantic_cache()
+    out.update(semantic_hits=semantic.hits, semantic_misses=semantic.misses, semantic_size=len(semantic))
+    return out
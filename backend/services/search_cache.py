@@ -0,0 +1,324 @@
+"""Search result caches: exact two-tier (bounded LRU memory + SQLite disk shared by all workers) and semantic (query embedding similarity)."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from backend.core.config import get_settings
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+Hits = list[dict[str, str]]
+
+_SWEEP_INTERVAL_SECONDS = 60.0
+_DISK_PRUNE_EVERY = 50  # 每 N 次写入做一次过期清理 + 容量裁剪
+
+
+def _cache_db_path() -> Path:
+    base = os.environ.get("WISDOMPROMPT_DATA_DIR")
+    if base:
+        return Path(base) / "search_cache.sqlite3"
+    return Path(__file__).resolve().parents[2] / "data" / "search_cache.sqlite3"
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace and casefold so trivially different spellings share one entry."""
+    return " ".join(query.split()).casefold()
+
+
+def cache_key(provider: str, query: str, count: int) -> str:
+    return f"{provider}\x1f{count}\x1f{normalize_query(query)}"
+
+
+class _MemoryTier:
+    """LRU with TTL; expired entries are swept periodically, not only on read."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._data: OrderedDict[str, tuple[float, Hits]] = OrderedDict()
+        self._max = max(1, max_entries)
+        self._ttl = ttl
+        self._last_sweep = time.time()
+        self.evictions = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, now: float) -> Optional[Hits]:
+        self._maybe_sweep(now)
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        ts, hits = entry
+        if now - ts > self._ttl:
+            del self._data[key]
+            self.expired += 1
+            return None
+        self._data.move_to_end(key)
+        return hits
+
+    def set(self, key: str, hits: Hits, ts: float) -> None:
+        self._maybe_sweep(ts)
+        self._data[key] = (ts, hits)
+        self._data.move_to_end(key)
+        while len(self._data) > self._max:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now - self._last_sweep < _SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        stale = [k for k, (ts, _) in self._data.items() if now - ts > self._ttl]
+        for k in stale:
+            del self._data[k]
+        self.expired += len(stale)
+
+
+class _DiskTier:
+    """SQLite (WAL) table keyed by cache key; visible to every uvicorn worker and survives restarts."""
+
+    def __init__(self, path: Path, max_entries: int, ttl: float):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            " key TEXT PRIMARY KEY, provider TEXT NOT NULL, created_at REAL NOT NULL, hits TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS search_cache_created ON search_cache(created_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._max = max(1, max_entries)
+        self._ttl = ttl
+        self._writes = 0
+        self.evictions = 0
+
+    def get_many(self, keys: list[str], now: float) -> dict[str, tuple[float, Hits]]:
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, created_at, hits FROM search_cache WHERE key IN ({marks}) AND created_at >= ?",
+                (*keys, now - self._ttl),
+            ).fetchall()
+        return {r[0]: (float(r[1]), json.loads(r[2])) for r in rows}
+
+    def set(self, key: str, provider: str, hits: Hits, ts: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, provider, created_at, hits) VALUES (?, ?, ?, ?)",
+                (key, provider, ts, json.dumps(hits, ensure_ascii=False)),
+            )
+            self._writes += 1
+            if self._writes % _DISK_PRUNE_EVERY == 0:
+                self._prune(ts)
+            self._conn.commit()
+
+    def _prune(self, now: float) -> None:
+        cur = self._conn.execute("DELETE FROM search_cache WHERE created_at < ?", (now - self._ttl,))
+        removed = cur.rowcount
+        cur = self._conn.execute(
+            "DELETE FROM search_cache WHERE key IN ("
+            " SELECT key FROM search_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self._max,),
+        )
+        self.evictions += removed + cur.rowcount
+
+    def size(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT count(*) FROM search_cache").fetchone()[0])
+
+
+class SearchCache:
+    """Memory tier in front of an optional disk tier. Keys include provider + normalized query + count."""
+
+    def __init__(self, disk_path: Optional[Path] = None):
+        settings = get_settings()
+        self._memory = _MemoryTier(settings.SEARCH_CACHE_MAX_ENTRIES, settings.SEARCH_CACHE_TTL_SECONDS)
+        self._disk: Optional[_DiskTier] = None
+        if settings.SEARCH_CACHE_DISK_ENABLED:
+            try:
+                self._disk = _DiskTier(
+                    disk_path or _cache_db_path(),
+                    settings.SEARCH_CACHE_DISK_MAX_ENTRIES,
+                    settings.SEARCH_CACHE_DISK_TTL_SECONDS,
+                )
+            except Exception as e:
+                logger.warning("search_cache_disk_unavailable", error=str(e))
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "disk_errors": 0}
+
+    async def get(self, providers: list[str], query: str, count: int) -> Optional[tuple[str, Hits]]:
+        """Return (provider, hits) for the first provider in `providers` with a fresh entry."""
+        now = time.time()
+        keys = [(p, cache_key(p, query, count)) for p in providers]
+        for provider, key in keys:
+            hits = self._memory.get(key, now)
+            if hits is not None:
+                self._stats["memory_hits"] += 1
+                return provider, hits
+        if self._disk is not None and keys:
+            try:
+                found = await asyncio.to_thread(self._disk.get_many, [k for _, k in keys], now)
+            except Exception as e:
+                found = {}
+                self._stats["disk_errors"] += 1
+                logger.warning("search_cache_disk_get_failed", error=str(e))
+            for provider, key in keys:
+                if key in found:
+                    _, hits = found[key]
+                    # 提升到内存层按当前时间计 TTL，否则磁盘上的旧条目每次都会穿透内存层
+                    self._memory.set(key, hits, now)
+                    self._stats["disk_hits"] += 1
+                    return provider, hits
+        self._stats["misses"] += 1
+        return None
+
+    async def set(self, provider: str, query: str, count: int, hits: Hits) -> None:
+        now = time.time()
+        key = cache_key(provider, query, count)
+        self._memory.set(key, hits, now)
+        self._stats["sets"] += 1
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.set, key, provider, hits, now)
+            except Exception as e:
+                self._stats["disk_errors"] += 1
+                logger.warning("search_cache_disk_set_failed", error=str(e))
+
+    def stats(self) -> dict[str, int | float | bool]:
+        lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        out: dict[str, int | float | bool] = dict(self._stats)
+        out.update(
+            hit_rate=round(hits / lookups, 4) if lookups else 0.0,
+            memory_size=len(self._memory),
+            memory_evictions=self._memory.evictions,
+            memory_expired=self._memory.expired,
+            disk_enabled=self._disk is not None,
+        )
+        if self._disk is not None:
+            try:
+                out.update(disk_size=self._disk.size(), disk_evictions=self._disk.evictions)
+            except Exception:
+                pass
+        return out
+
+
+class SemanticSearchCache:
+    """
+    Reuses results of an earlier query whose embedding is close enough (cosine >= threshold) and fresh,
+    within the same scope (provider order + search mode, like the exact cache's provider key).
+    Embeddings live in one pre-normalized float32 matrix, so lookup is a single matrix-vector product.
+    Per process, in memory; eviction replaces the oldest entry.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self._max = max(1, max_entries)
+        self._ttl = ttl
+        self._threshold = threshold
+        self._matrix: Optional[np.ndarray] = None
+        self._ts = np.zeros(self._max, dtype=np.float64)
+        self._counts = np.zeros(self._max, dtype=np.int32)
+        # scope 字符串映射为整数 id，查找时与时间 / 条数一起做向量化过滤
+        self._scopes = np.full(self._max, -1, dtype=np.int32)
+        self._scope_ids: dict[str, int] = {}
+        self._hits: list[Optional[Hits]] = [None] * self._max
+        self._queries: list[str] = [""] * self._max
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vec: np.ndarray) -> Optional[np.ndarray]:
+        v = np.asarray(vec, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else None
+
+    def get(self, embedding: np.ndarray, count: int, scope: str = "") -> Optional[tuple[str, float, Hits]]:
+        """Return (cached query, similarity, hits) of the nearest fresh entry in `scope` above the threshold."""
+        q = self._normalize(embedding)
+        scope_id = self._scope_ids.get(scope)
+        if (
+            q is None
+            or scope_id is None
+            or self._matrix is None
+            or self._size == 0
+            or q.shape[0] != self._matrix.shape[1]
+        ):
+            self.misses += 1
+            return None
+        n = self._size
+        sims = self._matrix[:n] @ q
+        valid = (
+            (time.time() - self._ts[:n] <= self._ttl)
+            & (self._counts[:n] >= count)
+            & (self._scopes[:n] == scope_id)
+        )
+        sims = np.where(valid, sims, -1.0)
+        best = int(np.argmax(sims))
+        sim = float(sims[best])
+        if sim < self._threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        hits = self._hits[best] or []
+        return self._queries[best], sim, hits[:count]
+
+    def set(self, embedding: np.ndarray, query: str, count: int, hits: Hits, scope: str = "") -> None:
+        q = self._normalize(embedding)
+        if q is None:
+            return
+        if self._matrix is None or self._matrix.shape[1] != q.shape[0]:
+            # 首次写入或 embedding 维度变化：重建矩阵
+            self._matrix = np.zeros((self._max, q.shape[0]), dtype=np.float32)
+            self._size = 0
+        if self._size < self._max:
+            slot = self._size
+            self._size += 1
+        else:
+            slot = int(np.argmin(self._ts))
+        self._matrix[slot] = q
+        self._ts[slot] = time.time()
+        self._counts[slot] = count
+        self._scopes[slot] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+        self._hits[slot] = hits
+        self._queries[slot] = query
+
+    def __len__(self) -> int:
+        return self._size
+
+
+_search_cache: Optional[SearchCache] = None
+_semantic_cache: Optional[SemanticSearchCache] = None
+
+
+def get_search_cache() -> SearchCache:
+    """Singleton search cache (one memory tier per process; disk tier shared)."""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchCache()
+    return _search_cache
+
+
+def get_semantic_cache() -> SemanticSearchCache:
+    """Singleton semantic (embedding-similarity) search cache."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        settings = get_settings()
+        _semantic_cache = SemanticSearchCache(
+            settings.SEARCH_SEMANTIC_CACHE_MAX_ENTRIES,
+            settings.SEARCH_SEMANTIC_CACHE_TTL_SECONDS,
+            settings.SEARCH_SEMANTIC_CACHE_THRESHOLD,
+        )
+    return _semantic_cache
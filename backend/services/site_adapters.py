@@ -0,0 +1,211 @@
+"""Site adapters: fetch clean text for API-friendly sites with one small request instead of HTML + Readability."""
+
+from __future__ import annotations
+
+import asyncio
+import html as html_lib
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from functools import partial
+from typing import Awaitable, Callable, Optional
+from urllib.parse import unquote
+
+import httpx
+from backend.core.logging_config import get_logger
+from backend.services.http_client import get_http_client
+
+logger = get_logger(__name__)
+
+# Wikipedia / Stack Exchange 要求可识别的 UA，不用浏览器 UA
+_USER_AGENT = "WisdomPrompt/0.1 (content fetch; +https://github.com/CXL-edu/WisdomPrompt)"
+_MAX_BODY = 500_000
+_TAGS = re.compile(r"<[^>]+>")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+# 共享连接池的 client.get，已绑定 UA / 超时 / 跟随重定向
+AdapterGet = Callable[..., Awaitable[httpx.Response]]
+AdapterFetch = Callable[[re.Match[str], AdapterGet], Awaitable[Optional[str]]]
+
+
+@dataclass(frozen=True)
+class SiteAdapter:
+    name: str
+    pattern: re.Pattern[str]
+    fetch: AdapterFetch
+
+
+_REGISTRY: list[SiteAdapter] = []
+
+
+def register_adapter(name: str, pattern: str) -> Callable[[AdapterFetch], AdapterFetch]:
+    """Register an adapter for URLs matching `pattern` (regex, matched against the full URL).
+
+    Adapters are tried in registration order; the first match wins. An adapter returns the
+    page text, or None to let fetch_content fall back to the generic HTML path.
+    """
+
+    def deco(fn: AdapterFetch) -> AdapterFetch:
+        _REGISTRY.append(SiteAdapter(name, re.compile(pattern, re.IGNORECASE), fn))
+        return fn
+
+    return deco
+
+
+def adapter_names() -> list[str]:
+    return [a.name for a in _REGISTRY]
+
+
+def match_adapter(url: str) -> Optional[tuple[SiteAdapter, re.Match[str]]]:
+    for adapter in _REGISTRY:
+        m = adapter.pattern.match(url)
+        if m:
+            return adapter, m
+    return None
+
+
+async def fetch_via_adapter(url: str, timeout: float) -> Optional[dict]:
+    """Return {"content", "url", "source", "content_type"} when an adapter matches and succeeds; else None."""
+    matched = match_adapter(url)
+    if not matched:
+        return None
+    adapter, m = matched
+    try:
+        get = partial(
+            get_http_client().get,
+            headers={"User-Agent": _USER_AGENT},
+            timeout=timeout,
+            follow_redirects=True,
+        )
+        content = await adapter.fetch(m, get)
+    except Exception as e:
+        logger.info("site_adapter_failed", adapter=adapter.name, url=url[:80], error=str(e)[:200])
+        return None
+    if not content or not content.strip():
+        return None
+    content = content.strip()
+    return {
+        "content": content[:_MAX_BODY] if len(content) > _MAX_BODY else content,
+        "url": url,
+        "source": adapter.name,
+        "content_type": "text",  # API 正文 / raw 文件，已是纯文本或 Markdown
+    }
+
+
+def _html_fragment_to_text(html: str) -> str:
+    """Convert a small HTML fragment (API body field) to Markdown, or plain text without html2text."""
+    try:
+        import html2text
+
+        h2t = html2text.HTML2Text()
+        h2t.body_width = 0
+        text = h2t.handle(html)
+    except ImportError:
+        text = html_lib.unescape(_TAGS.sub(" ", html))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+# --- Built-in adapters (order matters: blob before repo root) ---
+
+
+@register_adapter(
+    "github_blob",
+    r"https?://(?:www\.)?github\.com/(?P<owner>[^/]+)/(?P<repo>[^/]+)/blob/(?P<path>[^?#]+)",
+)
+async def _github_blob(m: re.Match[str], get: AdapterGet) -> Optional[str]:
+    resp = await get(f"https://raw.githubusercontent.com/{m['owner']}/{m['repo']}/{m['path']}")
+    resp.raise_for_status()
+    return resp.text
+
+
+@register_adapter(
+    "github_readme",
+    r"https?://(?:www\.)?github\.com/(?P<owner>[^/?#]+)/(?P<repo>[^/?#]+?)(?:\.git)?/?(?:[?#].*)?$",
+)
+async def _github_readme(m: re.Match[str], get: AdapterGet) -> Optional[str]:
+    # HEAD 指向默认分支；README 非 .md 命名时返回 404，回退到通用链路
+    resp = await get(f"https://raw.githubusercontent.com/{m['owner']}/{m['repo']}/HEAD/README.md")
+    if resp.status_code == 404:
+        return None
+    resp.raise_for_status()
+    return resp.text
+
+
+@register_adapter(
+    "wikipedia",
+    r"https?://(?P<lang>[a-z][a-z0-9-]*)\.(?:m\.)?wikipedia\.org/wiki/(?P<title>[^?#]+)",
+)
+async def _wikipedia(m: re.Match[str], get: AdapterGet) -> Optional[str]:
+    title = unquote(m["title"]).replace("_", " ")
+    resp = await get(
+        f"https://{m['lang']}.wikipedia.org/w/api.php",
+        params={
+            "action": "query",
+            "prop": "extracts",
+            "explaintext": 1,
+            "redirects": 1,
+            "format": "json",
+            "formatversion": 2,
+            "titles": title,
+        },
+    )
+    resp.raise_for_status()
+    pages = (resp.json().get("query") or {}).get("pages") or []
+    if not pages or pages[0].get("missing"):
+        return None
+    extract = pages[0].get("extract") or ""
+    return f"# {pages[0].get('title', title)}\n\n{extract}" if extract else None
+
+
+_ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+@register_adapter(
+    "arxiv",
+    r"https?://(?:www\.|export\.)?arxiv\.org/(?:abs|pdf)/(?P<id>(?:[a-z\-]+(?:\.[a-z]{2})?/\d{7}|\d{4}\.\d{4,5})(?:v\d+)?)(?:\.pdf)?",
+)
+async def _arxiv(m: re.Match[str], get: AdapterGet) -> Optional[str]:
+    resp = await get("https://export.arxiv.org/api/query", params={"id_list": m["id"]})
+    resp.raise_for_status()
+    entry = ET.fromstring(resp.text).find(f"{_ATOM}entry")
+    if entry is None:
+        return None
+    summary = (entry.findtext(f"{_ATOM}summary") or "").strip()
+    if not summary:
+        return None
+    title = " ".join((entry.findtext(f"{_ATOM}title") or "").split())
+    authors = ", ".join(
+        (a.findtext(f"{_ATOM}name") or "").strip() for a in entry.findall(f"{_ATOM}author")
+    )
+    published = (entry.findtext(f"{_ATOM}published") or "")[:10]
+    return f"# {title}\n\nAuthors: {authors}\nPublished: {published}\n\n## Abstract\n\n{' '.join(summary.split())}"
+
+
+@register_adapter(
+    "stackoverflow",
+    r"https?://(?:www\.)?stackoverflow\.com/(?:questions|q)/(?P<id>\d+)",
+)
+async def _stackoverflow(m: re.Match[str], get: AdapterGet) -> Optional[str]:
+    # 内置 filter "withbody" 不带回答正文，问题与高票回答分两个小请求并发拉取
+    api = f"https://api.stackexchange.com/2.3/questions/{m['id']}"
+    q_resp, a_resp = await asyncio.gather(
+        get(api, params={"site": "stackoverflow", "filter": "withbody"}),
+        get(
+            f"{api}/answers",
+            params={"site": "stackoverflow", "filter": "withbody", "sort": "votes", "order": "desc", "pagesize": 3},
+        ),
+    )
+    q_resp.raise_for_status()
+    items = q_resp.json().get("items") or []
+    if not items:
+        return None
+    q = items[0]
+    # API 返回的 title 带 HTML 实体（&quot; / &#39;）
+    parts = [f"# {html_lib.unescape(q.get('title', ''))}", _html_fragment_to_text(q.get("body", ""))]
+    answers = (a_resp.json().get("items") or []) if a_resp.is_success else []
+    answers.sort(key=lambda a: (not a.get("is_accepted"), -int(a.get("score") or 0)))
+    for a in answers:
+        label = "Accepted answer" if a.get("is_accepted") else "Answer"
+        parts.append(f"## {label} (score {a.get('score', 0)})")
+        parts.append(_html_fragment_to_text(a.get("body", "")))
+    return "\n\n".join(p for p in parts if p)
@@ -0,0 +1,164 @@
+"""URL canonicalization: one spelling per page across providers, so the same page is fetched and embedded once."""
+
+from __future__ import annotations
+
+import re
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 通用跟踪参数（全部站点）
+_TRACKING_PARAMS = frozenset(
+    {
+        "gclid", "dclid", "gbraid", "wbraid", "fbclid", "msclkid", "yclid", "twclid", "igshid",
+        "mc_cid", "mc_eid", "_hsenc", "_hsmi", "mkt_tok", "ref_src", "ref_url", "spm", "scm",
+        "share_source", "share_medium", "share_plat", "share_tag", "share_from", "vd_source", "hmsr", "hmpl",
+    }
+)
+_TRACKING_PREFIXES = ("utm_", "pk_", "hmsr", "hmpl")
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+_MOBILE_PREFIXES = ("m.", "mobile.", "wap.")
+
+Parts = tuple[str, str, list[tuple[str, str]]]  # host, path, query pairs
+DomainRule = Callable[[str, str, list[tuple[str, str]]], Parts]
+
+_DOMAIN_RULES: list[tuple[re.Pattern[str], DomainRule]] = []
+
+
+def domain_rule(host_pattern: str) -> Callable[[DomainRule], DomainRule]:
+    """Register a rewrite for hosts matching `host_pattern` (regex, full match on the lowercased host)."""
+
+    def deco(fn: DomainRule) -> DomainRule:
+        _DOMAIN_RULES.append((re.compile(host_pattern), fn))
+        return fn
+
+    return deco
+
+
+def _is_tracking(key: str) -> bool:
+    k = key.lower()
+    return k in _TRACKING_PARAMS or k.startswith(_TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    https scheme, lowercase host without default port / mobile prefix, no fragment, no tracking params,
+    remaining params sorted, no trailing slash (except root), then site-specific rules.
+    Returns the input unchanged when it is not an http(s) URL.
+    """
+    raw = (url or "").strip()
+    if not raw:
+        return ""
+    if "://" not in raw and not raw.startswith("//"):
+        raw = "https://" + raw
+    try:
+        parts = urlsplit(raw)
+    except ValueError:
+        return url.strip()
+    scheme = (parts.scheme or "https").lower()
+    if scheme not in ("http", "https"):
+        return url.strip()
+    host = (parts.hostname or "").rstrip(".")
+    if not host:
+        return url.strip()
+    port = parts.port if parts.port is not None else None
+    if port is not None and str(port) != _DEFAULT_PORTS.get(scheme):
+        host_port = f"{host}:{port}"
+    else:
+        host_port = host
+    for prefix in _MOBILE_PREFIXES:
+        if host.startswith(prefix) and host.count(".") >= 2:
+            host_port = host_port[len(prefix):]
+            host = host[len(prefix):]
+            break
+
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking(k)]
+
+    for pattern, rule in _DOMAIN_RULES:
+        if pattern.fullmatch(host):
+            new_host, path, query = rule(host, path, query)
+            host_port = new_host + host_port[len(host):]
+            host = new_host
+            break
+
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+    query.sort()
+    # http / https 视为同一页面：统一 https
+    return urlunsplit(("https", host_port, path, urlencode(query, doseq=True), ""))
+
+
+def same_page(a: Optional[str], b: Optional[str]) -> bool:
+    return bool(a) and bool(b) and canonicalize_url(a or "") == canonicalize_url(b or "")
+
+
+# --- Domain rules ---
+
+
+@domain_rule(r"(?:www\.)?github\.com")
+def _github(host: str, path: str, query: list[tuple[str, str]]) -> Parts:
+    if path.endswith(".git"):
+        path = path[: -len(".git")]
+    return "github.com", path, [(k, v) for k, v in query if k not in ("tab",)]
+
+
+@domain_rule(r"[a-z0-9-]+(?:\.m)?\.wikipedia\.org")
+def _wikipedia(host: str, path: str, query: list[tuple[str, str]]) -> Parts:
+    return host.replace(".m.wikipedia.org", ".wikipedia.org"), path, query
+
+
+@domain_rule(r"(?:www\.)?youtube\.com|youtu\.be")
+def _youtube(host: str, path: str, query: list[tuple[str, str]]) -> Parts:
+    if host == "youtu.be":
+        video = path.strip("/").split("/")[0]
+        return "www.youtube.com", "/watch", [("v", video)] if video else []
+    if path == "/watch":
+        return "www.youtube.com", path, [(k, v) for k, v in query if k == "v"]
+    return "www.youtube.com", path, [(k, v) for k, v in query if k not in ("si", "feature", "pp")]
+
+
+_SO_HOSTS = r"(?:www\.)?(?:stackoverflow\.com|superuser\.com|serverfault\.com|askubuntu\.com|[a-z0-9-]+\.stackexchange\.com)"
+
+
+@domain_rule(_SO_HOSTS)
+def _stackexchange(host: str, path: str, query: list[tuple[str, str]]) -> Parts:
+    # /questions/ID/slug、/q/ID、/questions/ID/slug/answer_id 均归到问题页
+    m = re.match(r"^/(?:questions|q)/(\d+)", path)
+    if m:
+        return host.removeprefix("www."), f"/questions/{m.group(1)}", []
+    return host.removeprefix("www."), path, query
+
+
+@domain_rule(r"(?:www\.|export\.)?arxiv\.org")
+def _arxiv(host: str, path: str, query: list[tuple[str, str]]) -> Parts:
+    m = re.match(r"^/(?:abs|pdf)/(.+?)(?:\.pdf)?/?$", path)
+    if m:
+        return "arxiv.org", f"/abs/{m.group(1)}", []
+    return "arxiv.org", path, query
+
+
+@domain_rule(r"blog\.csdn\.net")
+def _csdn(host: str, path: str, query: list[tuple[str, str]]) -> Parts:
+    # 文章页的查询参数全是推荐位 / 跟踪信息
+    if "/article/details/" in path:
+        return host, path, []
+    return host, path, query
+
+
+@domain_rule(r"(?:www\.)?zhihu\.com|zhuanlan\.zhihu\.com")
+def _zhihu(host: str, path: str, query: list[tuple[str, str]]) -> Parts:
+    query = [(k, v) for k, v in query if k not in ("utm_id", "share_code", "utm_psn")]
+    if host == "zhihu.com":
+        host = "www.zhihu.com"
+    return host, path, query
+
+
+@domain_rule(r"(?:[a-z0-9-]+\.)?medium\.com")
+def _medium(host: str, path: str, query: list[tuple[str, str]]) -> Parts:
+    return host, path, [(k, v) for k, v in query if k not in ("source", "sk")]
+
+
+@domain_rule(r"(?:www\.|mobile\.)?(?:twitter|x)\.com")
+def _twitter(host: str, path: str, query: list[tuple[str, str]]) -> Parts:
+    return "x.com", path, [(k, v) for k, v in query if k not in ("s", "t", "ref_src")]
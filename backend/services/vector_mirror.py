@@ -0,0 +1,208 @@
+"""In-process mirror of the vector store's embeddings: memory-mapped float32 matrix of normalized vectors + id arrays.
+
+DuckDB stays the system of record; the mirror only answers "which rows are nearest" with one matrix product and
+argpartition, and is rebuilt from DuckDB whenever it disagrees with it. Files are append-only and mapped read-only,
+so processes mapping the same directory share the pages through the OS page cache. A rebuild writes new files and
+renames them over the old ones, so a mapped file is never truncated.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+
+import duckdb
+import numpy as np
+from backend.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+KIND_PASSAGE = 0
+KIND_DOCUMENT = 1  # 未分段的旧文档行（knowledge.n_passages = 0）
+
+_SYNC_CHUNK = 10_000
+_FILES = ("vectors.f32", "kinds.u8", "ids.i64")  # ids 最后写、最后替换：行数以 ids 为准
+
+
+def _fetch_new(
+    conn: duckdb.DuckDBPyConnection, kind: int, after_id: int
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Rows with id > after_id (ids come from sequences, so they only grow), in chunks."""
+    if kind == KIND_PASSAGE:
+        sql = "SELECT id, embedding FROM passages WHERE id > ? AND embedding IS NOT NULL ORDER BY id LIMIT ?"
+    else:
+        sql = "SELECT id, embedding FROM knowledge WHERE id > ? AND n_passages = 0 ORDER BY id LIMIT ?"
+    chunks = []
+    while True:
+        rows = conn.execute(sql, [after_id, _SYNC_CHUNK]).fetchall()
+        if not rows:
+            return chunks
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        chunks.append((ids, np.array([r[1] for r in rows], dtype=np.float32)))
+        after_id = int(ids[-1])
+
+
+def _expected_count(conn: duckdb.DuckDBPyConnection) -> int:
+    return conn.execute(
+        "SELECT (SELECT count(*) FROM passages WHERE embedding IS NOT NULL)"
+        " + (SELECT count(*) FROM knowledge WHERE n_passages = 0)"
+    ).fetchone()[0]
+
+
+class VectorMirror:
+    """
+    `vectors.f32` (n x dimension, L2-normalized), `kinds.u8` and `ids.i64` (n each) under `directory`.
+    Appends write vectors, kinds, then ids; the row count is taken from ids, so a reader never maps a
+    half-written row. Searches use a snapshot of the mapped arrays and never block the writer; a rebuild
+    swaps in new files, and snapshots taken before it keep reading the old inodes.
+    """
+
+    def __init__(self, directory: Path, dimension: int):
+        self._dir = directory
+        self._dim = dimension
+        self._lock = threading.Lock()  # 追加 / 重建互斥；检索只读快照
+        # (vectors, kinds, ids) 作为一个整体替换：重建后行序变化，读者不能混用新旧数组
+        self._arrays: tuple[np.ndarray, np.ndarray, np.ndarray] = (
+            np.zeros((0, dimension), dtype=np.float32),
+            np.zeros(0, dtype=np.uint8),
+            np.zeros(0, dtype=np.int64),
+        )
+        self._last_id = {KIND_PASSAGE: 0, KIND_DOCUMENT: 0}  # 已镜像的最大 id（增量同步水位）
+
+    @property
+    def size(self) -> int:
+        return len(self._arrays[2])
+
+    def _path(self, name: str) -> Path:
+        return self._dir / name
+
+    def _map(self) -> None:
+        n = os.path.getsize(self._path("ids.i64")) // 8
+        if n == 0:
+            self._arrays = (
+                np.zeros((0, self._dim), dtype=np.float32),
+                np.zeros(0, dtype=np.uint8),
+                np.zeros(0, dtype=np.int64),
+            )
+            return
+        self._arrays = (
+            np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(n, self._dim)),
+            np.memmap(self._path("kinds.u8"), dtype=np.uint8, mode="r", shape=(n,)),
+            np.memmap(self._path("ids.i64"), dtype=np.int64, mode="r", shape=(n,)),
+        )
+
+    def _truncate(self, n: int) -> None:
+        """Drop a torn tail; only called from load, before this mirror has mapped anything."""
+        for name, width in zip(_FILES, (4 * self._dim, 1, 8)):
+            with open(self._path(name), "ab") as f:
+                f.truncate(n * width)
+
+    def load(self, conn: duckdb.DuckDBPyConnection) -> None:
+        """Map existing files (dropping a torn tail), catch up with DuckDB, rebuild if counts still disagree."""
+        with self._lock:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            sizes = [
+                os.path.getsize(self._path(name)) // width if self._path(name).exists() else 0
+                for name, width in zip(_FILES, (4 * self._dim, 1, 8))
+            ]
+            self._truncate(min(sizes))
+            self._map()
+            _, kinds, ids = self._arrays
+            for kind in self._last_id:
+                mask = kinds == kind
+                self._last_id[kind] = int(ids[mask].max()) if mask.any() else 0
+            self._sync_locked(conn)
+            expected = _expected_count(conn)
+            if self.size != expected:
+                logger.info("vector_mirror_rebuild", path=str(self._dir), mirrored=self.size, expected=expected)
+                self._rebuild_locked(conn)
+            logger.info("vector_mirror_loaded", path=str(self._dir), rows=self.size)
+
+    def sync(self, conn: duckdb.DuckDBPyConnection) -> None:
+        """Append rows committed since the last sync (called by the store's writer after each batch)."""
+        with self._lock:
+            self._sync_locked(conn)
+
+    def rebuild(self, conn: duckdb.DuckDBPyConnection) -> None:
+        """Start over from DuckDB (after deletes: the files are append-only). Safe while searches run."""
+        with self._lock:
+            self._rebuild_locked(conn)
+
+    def _rebuild_locked(self, conn: duckdb.DuckDBPyConnection) -> None:
+        # 写到旁边的 .new 再 os.replace：正在检索的快照仍映射旧 inode；原地截断会让它们 SIGBUS
+        for name in _FILES:
+            open(self._path(name + ".new"), "wb").close()
+        last_id = dict.fromkeys(self._last_id, 0)
+        try:
+            self._append(conn, last_id, ".new")
+        except Exception:
+            for name in _FILES:
+                self._path(name + ".new").unlink(missing_ok=True)
+            raise
+        for name in _FILES:
+            os.replace(self._path(name + ".new"), self._path(name))
+        self._last_id = last_id
+        self._map()
+
+    def _sync_locked(self, conn: duckdb.DuckDBPyConnection) -> None:
+        if self._append(conn, self._last_id):
+            self._map()
+
+    def _append(self, conn: duckdb.DuckDBPyConnection, last_id: dict[int, int], suffix: str = "") -> int:
+        """Append rows past the `last_id` watermarks (updated in place) to the files named with `suffix`."""
+        appended = 0
+        for kind in (KIND_PASSAGE, KIND_DOCUMENT):
+            for ids, vectors in _fetch_new(conn, kind, last_id[kind]):
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                vectors = vectors / np.where(norms > 0, norms, 1.0)
+                with open(self._path("vectors.f32" + suffix), "ab") as f:
+                    f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                with open(self._path("kinds.u8" + suffix), "ab") as f:
+                    f.write(np.full(len(ids), kind, dtype=np.uint8).tobytes())
+                with open(self._path("ids.i64" + suffix), "ab") as f:
+                    f.write(ids.tobytes())
+                appended += len(ids)
+                last_id[kind] = int(ids[-1])
+        return appended
+
+    def mask(self, passage_ids: np.ndarray, document_ids: np.ndarray) -> np.ndarray:
+        """Boolean row mask of the current snapshot: rows whose (kind, id) is among the given ids."""
+        _, kinds, ids = self._arrays
+        count = min(len(kinds), len(ids))
+        kinds, ids = kinds[:count], ids[:count]
+        return ((kinds == KIND_PASSAGE) & np.isin(ids, passage_ids)) | (
+            (kinds == KIND_DOCUMENT) & np.isin(ids, document_ids)
+        )
+
+    def top_k(
+        self, queries: np.ndarray, n: int, allowed: np.ndarray | None = None
+    ) -> list[list[tuple[int, int, float]]]:
+        """For each query row: up to n (kind, id, cosine similarity), best first; only rows set in `allowed`
+        (a mask from `mask`; rows appended after it was taken are left out) when given."""
+        vectors, kinds, ids = self._arrays
+        count = min(len(vectors), len(kinds), len(ids))
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))[:, : self._dim]
+        rows = np.arange(count)
+        if allowed is not None:
+            rows = np.flatnonzero(allowed[:count])
+        if len(rows) == 0:
+            return [[] for _ in range(len(q))]
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms > 0, norms, 1.0)
+        if allowed is not None:
+            # 只对过滤后的行取子矩阵算相似度
+            vectors, kinds, ids = vectors[rows], kinds[rows], ids[rows]
+            count = len(rows)
+        sims = q @ vectors[:count].T  # (queries, count)
+        n = min(n, count)
+        out = []
+        for row in sims:
+            idx = np.argpartition(-row, n - 1)[:n] if n < count else np.arange(count)
+            idx = idx[np.argsort(-row[idx])]
+            out.append([(int(kinds[i]), int(ids[i]), float(row[i])) for i in idx])
+        return out
+
+
+def mirror_dir(db_path: str) -> Path:
+    return Path(db_path + ".mirror")
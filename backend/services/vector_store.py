@@ -1,14 +1,26 @@
-"""DuckDB + VSS vector store: async writes, dedup by URL, top_k search with min similarity."""
+"""DuckDB + VSS vector store: one long-lived connection (cursors for readers), a single writer task with batched
+transactions, documents with passage child rows, dedup by URL, passage-level top_k search grouped per document."""
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Iterator, List, Optional, Sequence
+from urllib.parse import urlparse
 
 import duckdb
+import numpy as np
 from backend.core.config import get_settings
 from backend.core.logging_config import get_logger
+from backend.services.embedding_providers import EmbeddingProvider, get_embedding_provider
+from backend.services.url_canon import canonicalize_url
+from backend.services.vector_mirror import KIND_DOCUMENT, KIND_PASSAGE, VectorMirror, mirror_dir
 
 logger = get_logger(__name__)
 
@@ -16,15 +28,27 @@ logger = get_logger(__name__)
 DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "vectors.duckdb")
 
 
-def _get_db_path() -> str:
+# 引入可插拔 embedding 之前的库：Gemini text-embedding-004 / 768 维继续使用 vectors.duckdb
+_LEGACY_SPACE = ("gemini", "text-embedding-004", 768)
+
+
+def _get_db_path(provider: Optional[EmbeddingProvider] = None) -> str:
+    """One DuckDB file per embedding space (provider, model, dimension) so vectors never mix."""
+    provider = provider or get_embedding_provider()
+    if (provider.name, provider.model_id, provider.dimension) == _LEGACY_SPACE:
+        name = "vectors.duckdb"
+    else:
+        slug = re.sub(r"[^a-z0-9]+", "-", provider.model_id.lower()).strip("-")
+        name = f"vectors-{provider.name}-{slug}-{provider.dimension}.duckdb"
     base = os.environ.get("WISDOMPROMPT_DATA_DIR")
     if base:
-        return str(Path(base) / "vectors.duckdb")
-    return DEFAULT_DB_PATH
+        return str(Path(base) / name)
+    return os.path.join(os.path.dirname(DEFAULT_DB_PATH), name)
 
 
 def _ensure_db_and_table(conn: duckdb.DuckDBPyConnection, dimension: int) -> None:
-    conn.execute("INSTALL vss; LOAD vss;")
+    """Schema setup; runs once when the store's connection is opened. Needs no extension: the cosine functions
+    are built into DuckDB, VSS is only loaded for the HNSW index (_ensure_hnsw)."""
     conn.execute("CREATE SEQUENCE IF NOT EXISTS knowledge_id_seq;")
     conn.execute(
         """
@@ -39,113 +63,1210 @@ def _ensure_db_and_table(conn: duckdb.DuckDBPyConnection, dimension: int) -> Non
         """
         % dimension
     )
-    # Dedup by url is done in _sync_add (SELECT before INSERT)
+    # 文档行（knowledge）+ 段落子行（passages）；n_passages = 0 的旧行仍按整篇向量检索
+    conn.execute("ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS n_passages INTEGER DEFAULT 0")
+    # 检索命中统计：保留策略按最近命中（LRU）淘汰
+    conn.execute("ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS hit_count INTEGER DEFAULT 0")
+    conn.execute("ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS last_hit_at TIMESTAMP")
+    # 结构化元数据（SearchFilter 过滤用）：域名取自规范 URL，内容类型 / 语言由入库方给出，fetched_at 为抓取入库时间
+    has_metadata = conn.execute(
+        "SELECT 1 FROM duckdb_columns() WHERE table_name = 'knowledge' AND column_name = 'fetched_at'"
+    ).fetchone()
+    conn.execute("ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS domain TEXT")
+    conn.execute("ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS content_type TEXT")
+    conn.execute("ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS language TEXT")
+    conn.execute("ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS fetched_at TIMESTAMP DEFAULT current_timestamp")
+    if not has_metadata:
+        # 旧行：域名从 URL 解析，抓取时间按入库时间（新增列的默认值会把它们都填成现在）
+        conn.execute(
+            "UPDATE knowledge SET domain = nullif(lower(regexp_extract(url, '^[a-zA-Z]+://([^/:?#]+)', 1)), ''),"
+            " fetched_at = created_at"
+        )
+    conn.execute("CREATE SEQUENCE IF NOT EXISTS passage_id_seq;")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS passages (
+            id BIGINT PRIMARY KEY,
+            doc_id BIGINT NOT NULL,
+            position INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            embedding FLOAT[%d]
+        )
+        """
+        % dimension
+    )
+    # 量化列（VECTOR_QUANTIZATION）：int8 标量量化用于候选粗排 / 无 float 时的重打分，1-bit 码用于 Hamming 预筛
+    conn.execute("ALTER TABLE passages ADD COLUMN IF NOT EXISTS embedding_i8 TINYINT[%d]" % dimension)
+    conn.execute("ALTER TABLE passages ADD COLUMN IF NOT EXISTS embedding_bin BIT")
+    if get_settings().VECTOR_QUANTIZATION != "none":
+        _backfill_quantized(conn, dimension)
+    _ensure_unique_url(conn)
+
+
+def _url_domain(url: Optional[str]) -> Optional[str]:
+    return (urlparse(url).hostname or None) if url else None
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """
+    Metadata conditions for search / search_many; every given condition must hold (empty = no condition).
+    `domains` also match subdomains; rows with an unknown content type or language never match those filters.
+    """
+
+    sources: Sequence[str] = ()
+    exclude_sources: Sequence[str] = ()
+    domains: Sequence[str] = ()
+    content_types: Sequence[str] = ()
+    languages: Sequence[str] = ()
+    fetched_after: Optional[datetime] = None
+
+    def sql(self, alias: str) -> tuple[str, list]:
+        """WHERE condition on a knowledge row aliased `alias`, with its parameters."""
+        conds: list[str] = []
+        params: list = []
+        if self.sources:
+            conds.append(f"list_contains(?::VARCHAR[], {alias}.source)")
+            params.append(list(self.sources))
+        if self.exclude_sources:
+            conds.append(f"({alias}.source IS NULL OR NOT list_contains(?::VARCHAR[], {alias}.source))")
+            params.append(list(self.exclude_sources))
+        if self.domains:
+            conds.append(
+                f"list_bool_or(list_transform(?::VARCHAR[], lambda d: {alias}.domain = d"
+                f" OR ends_with({alias}.domain, '.' || d)))"
+            )
+            params.append([d.lower() for d in self.domains])
+        if self.content_types:
+            conds.append(f"list_contains(?::VARCHAR[], {alias}.content_type)")
+            params.append(list(self.content_types))
+        if self.languages:
+            conds.append(f"list_contains(?::VARCHAR[], {alias}.language)")
+            params.append(list(self.languages))
+        if self.fetched_after is not None:
+            conds.append(f"{alias}.fetched_at >= ?")
+            params.append(self.fetched_after)
+        return " AND ".join(conds) or "TRUE", params
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.sources
+            or self.exclude_sources
+            or self.domains
+            or self.content_types
+            or self.languages
+            or self.fetched_after is not None
+        )
+
+
+def _filter_sql(
+    filters: Optional[SearchFilter], doc_id: Optional[str] = None, alias: str = "k", keyword: str = "AND"
+) -> tuple[str, list]:
+    """
+    " <keyword> <condition>" on a knowledge row `alias`, or with `doc_id` (a passages column) a semi-join on
+    the matching document ids; ("", []) without filters, so unfiltered SQL keeps the exact shape the HNSW
+    rewrite matches. Pushed into the scan: only matching rows get a distance.
+    """
+    if not filters:
+        return "", []
+    cond, params = filters.sql("f" if doc_id else alias)
+    if doc_id:
+        cond = f"{doc_id} IN (SELECT f.id FROM knowledge f WHERE {cond})"
+    return f" {keyword} {cond}", params
 
 
-def _sync_add(content: str, url: Optional[str], source: str, embedding: List[float], db_path: str, dimension: int) -> None:
+def _ensure_unique_url(conn: duckdb.DuckDBPyConnection) -> None:
+    """Unique index on knowledge.url (dedup = INSERT ... ON CONFLICT DO NOTHING). Older files may hold raw,
+    non-canonical URLs (written before url_canon) and duplicates from concurrent writers: URLs are canonicalized
+    first, then the oldest row of each URL is kept."""
+    if conn.execute("SELECT 1 FROM duckdb_indexes() WHERE index_name = 'knowledge_url_canon_uq'").fetchone():
+        return
+    # 旧索引建在原始写法上，不能说明 URL 已规范化；改写索引列前先删掉
+    conn.execute("DROP INDEX IF EXISTS knowledge_url_uq")
+    changed = [
+        (row_id, canonical)
+        for row_id, url in conn.execute("SELECT id, url FROM knowledge WHERE url IS NOT NULL").fetchall()
+        if (canonical := canonicalize_url(url) or url) != url
+    ]
+    if changed:
+        conn.register(
+            "canonical_urls",
+            {
+                "id": np.array([i for i, _ in changed], dtype=np.int64),
+                "url": np.array([u for _, u in changed], dtype=object),
+                "domain": np.array([_url_domain(u) for _, u in changed], dtype=object),
+            },
+        )
+        conn.execute(
+            "UPDATE knowledge SET url = c.url, domain = c.domain FROM canonical_urls c WHERE knowledge.id = c.id"
+        )
+        conn.unregister("canonical_urls")
+        logger.info("vector_store_canonicalized_urls", rows=len(changed))
+    dup_ids = (
+        "SELECT id FROM knowledge WHERE url IS NOT NULL"
+        " AND id NOT IN (SELECT min(id) FROM knowledge WHERE url IS NOT NULL GROUP BY url)"
+    )
+    removed = conn.execute(f"SELECT count(*) FROM ({dup_ids})").fetchone()[0]
+    if removed:
+        conn.execute(f"DELETE FROM passages WHERE doc_id IN ({dup_ids})")
+        conn.execute(f"DELETE FROM knowledge WHERE id IN ({dup_ids})")
+        logger.info("vector_store_removed_duplicate_urls", rows=removed)
+    conn.execute("CREATE UNIQUE INDEX knowledge_url_canon_uq ON knowledge (url)")
+
+
+_HNSW_INDEXES = (("passages_hnsw", "passages"), ("knowledge_hnsw", "knowledge"))
+
+
+def _ensure_hnsw(conn: duckdb.DuckDBPyConnection) -> None:
+    """Load VSS and build cosine HNSW indexes on passage and document vectors, persisted in the database file."""
+    settings = get_settings()
     try:
-        conn = duckdb.connect(db_path)
-        try:
-            _ensure_db_and_table(conn, dimension)
-            if url:
-                existing = conn.execute("SELECT 1 FROM knowledge WHERE url = ?", [url]).fetchone()
-                if existing:
-                    logger.debug("vector_store_skip_duplicate_url", url=url)
-                    return
-            embed_lit = _embedding_literal(embedding, dimension)
-            new_id = conn.execute("SELECT nextval('knowledge_id_seq')").fetchone()[0]
-            conn.execute(
-                "INSERT INTO knowledge (id, content, url, source, embedding) VALUES (?, ?, ?, ?, " + embed_lit + ")",
-                [new_id, content, url, source],
+        conn.execute("LOAD vss")
+    except duckdb.Error:
+        conn.execute("INSTALL vss; LOAD vss;")
+    conn.execute("SET hnsw_enable_experimental_persistence = true")
+    for index, table in _HNSW_INDEXES:
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {index} ON {table} USING HNSW (embedding)"
+            f" WITH (metric = 'cosine', M = {int(settings.VECTOR_HNSW_M)},"
+            f" ef_construction = {int(settings.VECTOR_HNSW_EF_CONSTRUCTION)})"
+        )
+
+
+def _compact_hnsw(conn: duckdb.DuckDBPyConnection) -> None:
+    """Deleted rows stay in the graph as tombstones until the index is compacted."""
+    for index, _ in _HNSW_INDEXES:
+        conn.execute(f"PRAGMA hnsw_compact_index('{index}')")
+
+
+# 词元保留字母与数字（默认规则会丢掉数字，错误码 / 版本号就搜不到了）
+_FTS_IGNORE = r"[^\p{L}\p{N}_]+"
+
+
+def _ensure_fts(conn: duckdb.DuckDBPyConnection) -> None:
+    try:
+        conn.execute("LOAD fts")
+    except duckdb.Error:
+        conn.execute("INSTALL fts; LOAD fts;")
+
+
+def _fts_stale(conn: duckdb.DuckDBPyConnection) -> bool:
+    if not conn.execute("SELECT 1 FROM duckdb_schemas() WHERE schema_name = 'fts_main_passages'").fetchone():
+        return True
+    indexed = conn.execute("SELECT count(*) FROM fts_main_passages.docs").fetchone()[0]
+    return indexed != conn.execute("SELECT count(*) FROM passages").fetchone()[0]
+
+
+def _rebuild_fts(conn: duckdb.DuckDBPyConnection) -> None:
+    """BM25 index over passages.content. DuckDB's FTS index is a snapshot: rows written later are not in it
+    until the next rebuild."""
+    conn.execute(
+        "PRAGMA create_fts_index('passages', 'id', 'content',"
+        f" stemmer = 'porter', stopwords = 'english', ignore = '{_FTS_IGNORE}',"
+        " strip_accents = 1, lower = 1, overwrite = 1)"
+    )
+
+
+def _evict(
+    conn: duckdb.DuckDBPyConnection, ttl_days: dict[str, float], max_rows: int, max_bytes: int, dimension: int
+) -> tuple[int, int]:
+    """
+    Pick documents to drop -- past their source's TTL ("*" = any other source), then least recently hit
+    (last_hit_at, else created_at) beyond max_rows / max_bytes -- and delete them with their passages.
+    Bytes are estimated per document (text + float32 vectors of the document and its passages): DuckDB's
+    used-block count does not go down after deletes, so it cannot tell when eviction has done enough.
+    Returns (documents, passages) deleted.
+    """
+    conn.execute("CREATE OR REPLACE TEMP TABLE evict_ids (id BIGINT)")
+    named = [source for source in ttl_days if source != "*"]
+    for source, days in ttl_days.items():
+        if source != "*":
+            where, params = "source = ?", [source]
+        elif named:
+            where, params = "source NOT IN (SELECT unnest(?::VARCHAR[]))", [named]
+        else:
+            where, params = "TRUE", []
+        conn.execute(
+            f"INSERT INTO evict_ids SELECT id FROM knowledge WHERE {where}"
+            " AND created_at < now()::TIMESTAMP - to_seconds(?::DOUBLE)",
+            [*params, float(days) * 86400.0],
+        )
+    if max_rows > 0 or max_bytes > 0:
+        # 最近命中（或最近写入）的在前，累计行数 / 字节超限之后的全部淘汰
+        conn.execute(
+            f"""
+            INSERT INTO evict_ids
+            SELECT id FROM (
+                SELECT
+                    k.id,
+                    row_number() OVER w AS n,
+                    sum(strlen(k.content) + coalesce(strlen(k.url), 0) + {4 * dimension} + coalesce(p.bytes, 0)) OVER w
+                        AS bytes
+                FROM knowledge k
+                LEFT JOIN (
+                    SELECT doc_id, sum(strlen(content)) + count(*) * {4 * dimension} AS bytes
+                    FROM passages GROUP BY doc_id
+                ) p ON p.doc_id = k.id
+                WHERE k.id NOT IN (SELECT id FROM evict_ids)
+                WINDOW w AS (ORDER BY coalesce(k.last_hit_at, k.created_at) DESC, k.id DESC)
             )
-            conn.commit()
-        finally:
-            conn.close()
+            WHERE (? > 0 AND n > ?) OR (? > 0 AND bytes > ?)
+            """,
+            [max_rows, max_rows, max_bytes, max_bytes],
+        )
+    docs = conn.execute("SELECT count(*) FROM evict_ids").fetchone()[0]
+    if not docs:
+        return 0, 0
+    passages = conn.execute("DELETE FROM passages WHERE doc_id IN (SELECT id FROM evict_ids)").fetchone()[0]
+    conn.execute("DELETE FROM knowledge WHERE id IN (SELECT id FROM evict_ids)")
+    return int(docs), int(passages)
+
+
+def _quantize_int8(vectors: np.ndarray) -> np.ndarray:
+    """Per-vector symmetric scalar quantization; the scale cancels out in cosine similarity."""
+    m = np.atleast_2d(vectors).astype(np.float32, copy=False)
+    scale = np.abs(m).max(axis=1, keepdims=True)
+    scale[scale == 0] = 1.0
+    return np.round(m / scale * 127.0).astype(np.int8)
+
+
+def _binary_codes(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits packed into bytes, one hex string per row (unhex(...)::BIT in SQL for Hamming distance).
+    Strings rather than bytes: object columns are registered without type sampling (see VectorStore._cursor)."""
+    m = np.atleast_2d(vectors)
+    return np.array([np.packbits(row > 0).tobytes().hex() for row in m], dtype=object)
+
+
+def _backfill_quantized(conn: duckdb.DuckDBPyConnection, dimension: int) -> None:
+    """Quantize passages stored before quantization was enabled (they would be invisible to the candidate scan)."""
+    if not conn.execute(
+        "SELECT 1 FROM passages WHERE embedding_i8 IS NULL AND embedding IS NOT NULL LIMIT 1"
+    ).fetchone():
+        return
+    rows = conn.execute(
+        "SELECT id, embedding FROM passages WHERE embedding_i8 IS NULL AND embedding IS NOT NULL"
+    ).fetchall()
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    m = np.array([r[1] for r in rows], dtype=np.float32)
+    i8 = _register_vectors(conn, "backfill_i8", _quantize_int8(m), dimension, "TINYINT")
+    conn.register("backfill_ids", {"rid": np.arange(len(ids), dtype=np.int64), "id": ids, "bits": _binary_codes(m)})
+    conn.execute(
+        "UPDATE passages SET embedding_i8 = src.vec, embedding_bin = unhex(src.bits)::BIT FROM ("
+        f" SELECT b.id, i.vec, b.bits FROM backfill_ids b JOIN {i8} i USING (rid)) src WHERE passages.id = src.id"
+    )
+    logger.info("vector_store_quantized_backfill", rows=len(ids))
+
+
+# 写入任务执行的一次写操作：在已开启事务的 cursor 上执行，异常即整批回滚
+WriteOp = Callable[[duckdb.DuckDBPyConnection], None]
+
+
+def _write_many(
+    conn: duckdb.DuckDBPyConnection, items: List[tuple[str, Optional[str], str, np.ndarray]], dimension: int
+) -> int:
+    """Insert (content, url, source, embedding) rows with one statement; existing URLs are skipped by the unique
+    index. Returns the number of rows inserted."""
+    seen: set[str] = set()
+    rows = []
+    for content, url, source, embedding in items:
+        url = canonicalize_url(url) if url else None
+        if url is not None:
+            if url in seen:
+                continue
+            seen.add(url)
+        rows.append((content, url, source, embedding))
+    if not rows:
+        return 0
+    vecs = _register_vectors(conn, "new_vecs", np.stack([r[3] for r in rows]), dimension)
+    conn.register(
+        "new_items",
+        {
+            "rid": np.arange(len(rows), dtype=np.int64),
+            "content": np.array([r[0] for r in rows], dtype=object),
+            "url": np.array([r[1] for r in rows], dtype=object),
+            "source": np.array([r[2] for r in rows], dtype=object),
+            "domain": np.array([_url_domain(r[1]) for r in rows], dtype=object),
+        },
+    )
+    insert = (
+        "INSERT INTO knowledge (id, content, url, source, embedding, domain)"
+        " SELECT nextval('knowledge_id_seq'), t.content, t.url, t.source, v.vec, t.domain"
+        f" FROM new_items t JOIN {vecs} v USING (rid) WHERE t.url IS {{}} ORDER BY t.rid"
+    )
+    inserted = len(conn.execute(insert.format("NOT NULL") + " ON CONFLICT DO NOTHING RETURNING id").fetchall())
+    # 无 URL 的行不参与去重；单独插入（同一语句里 ON CONFLICT 会把多个 NULL 当成冲突）
+    if len(seen) < len(rows):
+        inserted += len(conn.execute(insert.format("NULL") + " RETURNING id").fetchall())
+    skipped = len(items) - inserted
+    if skipped:
+        logger.debug("vector_store_skip_duplicate_url", count=skipped)
+    return inserted
+
+
+def _write_document(
+    conn: duckdb.DuckDBPyConnection,
+    content: str,
+    url: Optional[str],
+    source: str,
+    passages: List[str],
+    embeddings: np.ndarray,
+    dimension: int,
+    content_type: Optional[str] = None,
+    language: Optional[str] = None,
+) -> None:
+    """Document row (embedding = normalized mean of its passages, plus metadata) and its passage rows."""
+    url = canonicalize_url(url) if url else None
+    mean = embeddings.mean(axis=0)
+    norm = float(np.linalg.norm(mean))
+    doc_vec = mean / norm if norm > 0 else mean
+    doc_vecs = _register_vectors(conn, "doc_vec", doc_vec, dimension)
+    passage_vecs = _register_vectors(conn, "passage_vecs", embeddings, dimension)
+    conn.register(
+        "passage_texts",
+        {"rid": np.arange(len(passages), dtype=np.int64), "content": np.array(passages, dtype=object)},
+    )
+    settings = get_settings()
+    cols = "id, doc_id, position, content, embedding"
+    keep_float = settings.VECTOR_STORE_FLOAT or settings.VECTOR_QUANTIZATION == "none"
+    select = "nextval('passage_id_seq'), ?, t.rid, t.content, " + ("v.vec" if keep_float else "NULL")
+    source_sql = f"passage_texts t JOIN {passage_vecs} v USING (rid)"
+    if settings.VECTOR_QUANTIZATION != "none":
+        # int8 与 1-bit 码一起存：binary 预筛后无 float 列时用 int8 重打分
+        passage_i8 = _register_vectors(conn, "passage_i8", _quantize_int8(embeddings), dimension, "TINYINT")
+        conn.register(
+            "passage_bits",
+            {"rid": np.arange(len(passages), dtype=np.int64), "bits": _binary_codes(embeddings)},
+        )
+        cols += ", embedding_i8, embedding_bin"
+        select += ", i.vec, unhex(b.bits)::BIT"
+        source_sql += f" JOIN {passage_i8} i USING (rid) JOIN passage_bits b USING (rid)"
+    inserted = conn.execute(
+        "INSERT INTO knowledge (id, content, url, source, embedding, n_passages, domain, content_type, language)"
+        f" SELECT nextval('knowledge_id_seq'), ?, ?, ?, vec, ?, ?, ?, ? FROM {doc_vecs}"
+        " ON CONFLICT DO NOTHING RETURNING id",
+        [content, url, source, len(passages), _url_domain(url), content_type, language],
+    ).fetchone()
+    if inserted is None:
+        logger.debug("vector_store_skip_duplicate_url", url=url)
+        return
+    doc_id = inserted[0]
+    conn.execute(
+        f"INSERT INTO passages ({cols}) SELECT {select} FROM {source_sql} ORDER BY t.rid",
+        [doc_id],
+    )
+
+
+def _apply_writes(cursor: duckdb.DuckDBPyConnection, ops: List[WriteOp], db_path: str) -> List[bool]:
+    """
+    Run queued writes in one transaction. If the batch fails, roll back and replay each op in its own
+    transaction so one bad item does not lose the others.
+    """
+    cursor.begin()
+    try:
+        for op in ops:
+            op(cursor)
+        cursor.commit()
+        return [True] * len(ops)
     except Exception as e:
-        logger.warning("vector_add_failed", path=db_path, error=str(e))
+        cursor.rollback()
+        if len(ops) == 1:
+            logger.warning("vector_add_failed", path=db_path, error=str(e))
+            return [False]
+    results = []
+    for op in ops:
+        results.extend(_apply_writes(cursor, [op], db_path))
+    return results
+
 
+def _register_vectors(
+    conn: duckdb.DuckDBPyConnection, name: str, vectors: np.ndarray, dimension: int, sql_type: str = "FLOAT"
+) -> str:
+    """
+    Expose float32 vectors (one, or a matrix of rows) to SQL through DuckDB's zero-copy NumPy scan and return
+    a subquery yielding (rid, vec <sql_type>[dim]). Never formatted into SQL text; also far cheaper than binding
+    a 768-element list parameter, which DuckDB converts element by element.
+    """
+    m = np.atleast_2d(vectors)[:, :dimension]
+    m = np.ascontiguousarray(m, dtype=np.int8 if sql_type == "TINYINT" else np.float32)
+    n = m.shape[0]
+    conn.register(
+        name,
+        {
+            "rid": np.repeat(np.arange(n, dtype=np.int64), dimension),
+            "pos": np.tile(np.arange(dimension, dtype=np.int32), n),
+            "x": m.reshape(-1),
+        },
+    )
+    return f"(SELECT rid, list(x ORDER BY pos)::{sql_type}[{dimension}] AS vec FROM {name} GROUP BY rid)"
 
-def _embedding_literal(vec: List[float], dimension: int) -> str:
-    """Safe literal for SQL: [v1,v2,...]::FLOAT[dim]. vec is our own data, not user input."""
-    part = ",".join(str(float(x)) for x in vec[:dimension])
-    return f"[{part}]::FLOAT[{dimension}]"
+
+def _group_passages(rows: list[tuple], per_doc: int) -> List[dict]:
+    """(doc_id, position, content, url, source, sim) rows sorted by sim -> one hit per document,
+    its best `per_doc` passages joined in document order."""
+    docs: dict[int, dict] = {}
+    for doc_id, position, text, url, source, sim in rows:
+        doc = docs.setdefault(doc_id, {"url": url, "source": source, "similarity": float(sim), "passages": []})
+        if len(doc["passages"]) < per_doc:
+            doc["passages"].append({"content": text, "position": position, "similarity": float(sim)})
+    hits = []
+    for doc in docs.values():
+        passages = sorted(doc["passages"], key=lambda p: p["position"])
+        hits.append({
+            "content": "\n\n".join(p["content"] for p in passages),
+            "url": doc["url"],
+            "source": doc["source"],
+            "similarity": doc["similarity"],
+            "passages": passages,
+        })
+    return hits
+
+
+def _passage_candidates_sql(
+    query_embedding: np.ndarray, qv: str, limit: int, dimension: int, filters: Optional[SearchFilter] = None
+) -> Optional[tuple[str, list]]:
+    """Candidate query over the quantized columns (None = scan full precision): int8 cosine, or Hamming
+    distance on sign bits for binary. Returns `limit * VECTOR_RESCORE_MULTIPLIER` passage ids."""
+    settings = get_settings()
+    mode = settings.VECTOR_QUANTIZATION
+    if mode == "none":
+        return None
+    n = limit * max(1, settings.VECTOR_RESCORE_MULTIPLIER)
+    where, params = _filter_sql(filters, doc_id="doc_id")
+    if mode == "int8":
+        return (
+            f"SELECT id FROM passages WHERE embedding_i8 IS NOT NULL{where}"
+            f" ORDER BY array_cosine_similarity(embedding_i8::FLOAT[{dimension}], {qv}) DESC LIMIT ?",
+            [*params, n],
+        )
+    bits = _binary_codes(np.asarray(query_embedding, dtype=np.float32)[:dimension])[0]
+    return (
+        f"SELECT id FROM passages WHERE embedding_bin IS NOT NULL{where}"
+        " ORDER BY bit_count(xor(embedding_bin, unhex(?)::BIT)) LIMIT ?",
+        [*params, bits, n],
+    )
 
 
 def _sync_search(
-    query_embedding: List[float], top_k: int, min_similarity: float, db_path: str, dimension: int
+    conn: duckdb.DuckDBPyConnection,
+    query_embedding: np.ndarray,
+    top_k: int,
+    min_similarity: float,
+    per_doc: int,
+    dimension: int,
+    hnsw: bool,
+    filters: Optional[SearchFilter] = None,
 ) -> List[dict]:
-    """Search with read_only when possible to avoid lock conflict with other processes (e.g. IDE)."""
-    if not os.path.exists(db_path):
-        return []
-    try:
-        conn = duckdb.connect(db_path, read_only=True)
-        try:
-            qlit = _embedding_literal(query_embedding, dimension)
-            sql = f"""
-                SELECT content, url, source, array_cosine_similarity(embedding, {qlit}) AS sim
-                FROM knowledge
-                WHERE array_cosine_similarity(embedding, {qlit}) >= ?
-                ORDER BY sim DESC
-                LIMIT ?
-                """
-            rows = conn.execute(sql, [min_similarity, top_k]).fetchall()
-            return [
-                {"content": r[0], "url": r[1], "source": r[2], "similarity": float(r[3])}
-                for r in rows
-            ]
-        finally:
-            conn.close()
-    except Exception as e:
-        logger.warning("vector_search_failed", path=db_path, error=str(e))
-        return []
+    """
+    Runs on a cursor of the store's connection (cursors can query concurrently; variables and registered
+    vectors are per cursor). Full-precision queries are `ORDER BY distance LIMIT n` over a single table with
+    a constant query vector, the shape the HNSW index scan replaces; the similarity threshold is applied
+    to those top rows afterwards. Filters are predicates of that same scan (the HNSW index does not take
+    predicates, so a filtered query is an exact top-n over the matching rows, never a post-filtered one).
+    """
+    q = _register_vectors(conn, "query_vec", query_embedding, dimension)
+    # getvariable 在规划时折叠成常量，HNSW 优化器才能匹配（连接子查询里的向量不行）
+    conn.execute(f"SET VARIABLE query_vec = (SELECT vec FROM {q})")
+    qv = f"getvariable('query_vec')::FLOAT[{dimension}]"
+    # 候选段落多取一些，按文档分组后仍能凑满 top_k 篇
+    limit = top_k * per_doc * 4
+    if hnsw:
+        conn.execute(f"SET hnsw_ef_search = {max(int(get_settings().VECTOR_HNSW_EF_SEARCH), limit)}")
+    quantized = _passage_candidates_sql(query_embedding, qv, limit, dimension, filters)
+    passage_where, passage_params = _filter_sql(filters, doc_id="doc_id", keyword="WHERE")
+    if quantized is None:
+        rows = conn.execute(
+            f"""
+            SELECT t.doc_id, t.position, t.content, k.url, k.source, 1 - t.dist AS sim
+            FROM (
+                SELECT doc_id, position, content, array_cosine_distance(embedding, {qv}) AS dist
+                FROM passages{passage_where}
+                ORDER BY dist
+                LIMIT {limit}
+            ) t JOIN knowledge k ON k.id = t.doc_id
+            WHERE 1 - t.dist >= ?
+            ORDER BY sim DESC
+            """,
+            [*passage_params, min_similarity],
+        ).fetchall()
+    else:
+        # 量化列粗排出候选，再用全精度（无 float 列时退回 int8）重打分
+        cand_sql, cand_params = quantized
+        rows = conn.execute(
+            f"""
+            WITH cand AS ({cand_sql})
+            SELECT p.doc_id, p.position, p.content, k.url, k.source,
+                   coalesce(
+                       array_cosine_similarity(p.embedding, {qv}),
+                       array_cosine_similarity(p.embedding_i8::FLOAT[{dimension}], {qv})
+                   ) AS sim
+            FROM cand JOIN passages p ON p.id = cand.id JOIN knowledge k ON k.id = p.doc_id
+            WHERE sim >= ?
+            ORDER BY sim DESC
+            LIMIT ?
+            """,
+            [*cand_params, min_similarity, limit],
+        ).fetchall()
+    hits = _group_passages(rows, per_doc)
+    # 未分段的旧文档行：在全部文档向量的近邻里筛（分段文档的均值向量也在其中，排不进前列的旧行也进不了 top_k）
+    doc_where, doc_params = _filter_sql(filters, keyword="WHERE")
+    legacy = conn.execute(
+        f"""
+        SELECT content, url, source, 1 - dist AS sim
+        FROM (
+            SELECT content, url, source, n_passages, array_cosine_distance(embedding, {qv}) AS dist
+            FROM knowledge k{doc_where}
+            ORDER BY dist
+            LIMIT {top_k * 4}
+        )
+        WHERE n_passages = 0 AND 1 - dist >= ?
+        ORDER BY sim DESC
+        LIMIT {top_k}
+        """,
+        [*doc_params, min_similarity],
+    ).fetchall()
+    return _merge_hits(hits, legacy, top_k)
+
+
+def _merge_hits(hits: List[dict], legacy: list[tuple], top_k: int) -> List[dict]:
+    """Grouped passage hits + legacy (content, url, source, sim) rows -> best top_k by similarity."""
+    hits.extend({"content": r[0], "url": r[1], "source": r[2], "similarity": float(r[3])} for r in legacy)
+    hits.sort(key=lambda h: h["similarity"], reverse=True)
+    return hits[:top_k]
+
+
+def _sync_search_many(
+    conn: duckdb.DuckDBPyConnection,
+    query_embeddings: np.ndarray,
+    top_k: int,
+    min_similarity: float,
+    per_doc: int,
+    dimension: int,
+    filters: Optional[SearchFilter] = None,
+) -> List[List[dict]]:
+    """
+    All queries in one pass over each table: passages x queries with a per-query top-n aggregate (max_by),
+    so every row is read once and compared against every query. Only for the unindexed full-precision path.
+    """
+    qs = _register_vectors(conn, "query_vecs", query_embeddings, dimension)
+    limit = top_k * per_doc * 4
+    passage_where, passage_params = _filter_sql(filters, doc_id="t.doc_id")
+    doc_where, doc_params = _filter_sql(filters, alias="t")
+
+    def top_per_query(table: str, where: str, n: int) -> str:
+        return f"""
+            SELECT qid, unnest(max_by({{'id': id, 'sim': sim}}, sim, {n})) AS hit
+            FROM (
+                SELECT q.rid AS qid, t.id, array_cosine_similarity(t.embedding, q.vec) AS sim
+                FROM {table} t, {qs} q
+                WHERE {where}
+            )
+            GROUP BY qid
+        """
+
+    rows = conn.execute(
+        f"""
+        WITH top AS ({top_per_query("passages", "t.embedding IS NOT NULL" + passage_where, limit)})
+        SELECT top.qid, p.doc_id, p.position, p.content, k.url, k.source, top.hit.sim AS sim
+        FROM top JOIN passages p ON p.id = top.hit.id JOIN knowledge k ON k.id = p.doc_id
+        WHERE top.hit.sim >= ?
+        ORDER BY top.qid, sim DESC
+        """,
+        [*passage_params, min_similarity],
+    ).fetchall()
+    legacy = conn.execute(
+        f"""
+        WITH top AS ({top_per_query("knowledge", "t.n_passages = 0" + doc_where, top_k)})
+        SELECT top.qid, k.content, k.url, k.source, top.hit.sim AS sim
+        FROM top JOIN knowledge k ON k.id = top.hit.id
+        WHERE top.hit.sim >= ?
+        ORDER BY top.qid, sim DESC
+        """,
+        [*doc_params, min_similarity],
+    ).fetchall()
+    n = len(np.atleast_2d(query_embeddings))
+    passage_rows: list[list[tuple]] = [[] for _ in range(n)]
+    legacy_rows: list[list[tuple]] = [[] for _ in range(n)]
+    for r in rows:
+        passage_rows[r[0]].append(r[1:])
+    for r in legacy:
+        legacy_rows[r[0]].append(r[1:])
+    return [_merge_hits(_group_passages(passage_rows[i], per_doc), legacy_rows[i], top_k) for i in range(n)]
+
+
+def _mirror_search(
+    conn: duckdb.DuckDBPyConnection,
+    mirror: VectorMirror,
+    query_embeddings: np.ndarray,
+    top_k: int,
+    min_similarity: float,
+    per_doc: int,
+    filters: Optional[SearchFilter] = None,
+) -> List[List[dict]]:
+    """Nearest rows from the in-memory mirror, then one primary-key lookup per table for their content.
+    With filters, the ids of matching rows are read first and the mirror ranks only those."""
+    limit = top_k * per_doc * 4
+    allowed = None
+    if filters:
+        passage_where, passage_params = _filter_sql(filters, doc_id="doc_id", keyword="WHERE")
+        doc_where, doc_params = _filter_sql(filters)
+        passage_ids = conn.execute(f"SELECT id FROM passages{passage_where}", passage_params).fetchnumpy()["id"]
+        doc_ids = conn.execute(f"SELECT id FROM knowledge k WHERE n_passages = 0{doc_where}", doc_params).fetchnumpy()["id"]
+        allowed = mirror.mask(passage_ids, doc_ids)
+    tops = [
+        [(kind, row_id, sim) for kind, row_id, sim in top if sim >= min_similarity]
+        for top in mirror.top_k(query_embeddings, limit + top_k, allowed)
+    ]
+
+    # 回表时再套一次过滤：掩码取自镜像快照，期间镜像若重建，行号可能已对不上
+    where, params = _filter_sql(filters, keyword="WHERE")
+
+    def lookup(kind: int, sql: str) -> dict[int, tuple]:
+        ids = np.unique(np.array([i for top in tops for k, i, _ in top if k == kind], dtype=np.int64))
+        if not len(ids):
+            return {}
+        conn.register("mirror_ids", {"id": ids})
+        return {r[0]: r[1:] for r in conn.execute(sql + where, params).fetchall()}
+
+    passages = lookup(
+        KIND_PASSAGE,
+        "SELECT p.id, p.doc_id, p.position, p.content, k.url, k.source"
+        " FROM mirror_ids m JOIN passages p ON p.id = m.id JOIN knowledge k ON k.id = p.doc_id",
+    )
+    documents = lookup(
+        KIND_DOCUMENT, "SELECT k.id, k.content, k.url, k.source FROM mirror_ids m JOIN knowledge k ON k.id = m.id"
+    )
+    results = []
+    for top in tops:
+        # 镜像里已删除的行在 DuckDB 查不到，直接跳过
+        rows = [(*passages[i], sim) for k, i, sim in top if k == KIND_PASSAGE and i in passages][:limit]
+        legacy = [(*documents[i], sim) for k, i, sim in top if k == KIND_DOCUMENT and i in documents][:top_k]
+        results.append(_merge_hits(_group_passages(rows, per_doc), legacy, top_k))
+    return results
+
+
+def _sync_bm25(
+    conn: duckdb.DuckDBPyConnection,
+    query_embedding: np.ndarray,
+    query_text: str,
+    top_k: int,
+    per_doc: int,
+    dimension: int,
+    filters: Optional[SearchFilter] = None,
+) -> List[dict]:
+    """BM25 top passages grouped per document, in BM25 order; "similarity" is still the cosine similarity."""
+    q = _register_vectors(conn, "query_vec", query_embedding, dimension)
+    passage_where, passage_params = _filter_sql(filters, doc_id="doc_id", keyword="WHERE")
+    rows = conn.execute(
+        f"""
+        SELECT b.doc_id, b.position, b.content, k.url, k.source,
+               coalesce(array_cosine_similarity(b.embedding, q.vec), 0.0) AS sim
+        FROM (
+            SELECT doc_id, position, content, embedding, fts_main_passages.match_bm25(id, ?) AS score
+            FROM passages{passage_where}
+        ) b JOIN knowledge k ON k.id = b.doc_id, {q} q
+        WHERE b.score IS NOT NULL
+        ORDER BY b.score DESC
+        LIMIT ?
+        """,
+        [query_text, *passage_params, top_k * per_doc * 4],
+    ).fetchall()
+    return _group_passages(rows, per_doc)[:top_k]
+
+
+def _hit_key(hit: dict) -> str:
+    return hit.get("url") or hit.get("content", "")[:200]
+
+
+def _rrf_fuse(ranked_lists: List[List[dict]], top_k: int, per_doc: int, k: int) -> List[dict]:
+    """Reciprocal-rank fusion of per-document hit lists; a document found by both keeps the best passages of both."""
+    scores: dict[str, float] = {}
+    hits: dict[str, dict] = {}
+    for results in ranked_lists:
+        for rank, hit in enumerate(results):
+            key = _hit_key(hit)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            prev = hits.get(key)
+            if prev is None:
+                hits[key] = hit
+            elif "passages" in prev and "passages" in hit:
+                by_pos = {p["position"]: p for p in prev["passages"] + hit["passages"]}
+                best = sorted(by_pos.values(), key=lambda p: -p["similarity"])[:per_doc]
+                passages = sorted(best, key=lambda p: p["position"])
+                hits[key] = {
+                    **prev,
+                    "content": "\n\n".join(p["content"] for p in passages),
+                    "similarity": max(prev["similarity"], hit["similarity"]),
+                    "passages": passages,
+                }
+    ranked = sorted(scores, key=lambda key: -scores[key])
+    return [hits[key] for key in ranked[:top_k]]
 
 
 class VectorStore:
-    """DuckDB + VSS vector store with async write and URL dedup."""
+    """
+    DuckDB + VSS vector store. One read-write connection per process, opened (schema + extension + HNSW) once;
+    with VECTOR_MIRROR_ENABLED, nearest-neighbour lookups go to an mmap'd NumPy mirror (vector_mirror) instead;
+    searches run on cursors in worker threads, writes are queued to a single writer task that commits
+    them in batches of up to VECTOR_WRITE_BATCH_SIZE. DuckDB allows one read-write process per file.
+    """
 
-    def __init__(self, db_path: Optional[str] = None):
-        self._db_path = db_path or _get_db_path()
+    def __init__(self, db_path: Optional[str] = None, provider: Optional[EmbeddingProvider] = None):
+        provider = provider or get_embedding_provider()
+        self._db_path = db_path or _get_db_path(provider)
         Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
         self._settings = get_settings()
-        self._dim = self._settings.EMBEDDING_DIMENSION
+        self._dim = provider.dimension
+        self._conn: Optional[duckdb.DuckDBPyConnection] = None
+        self._conn_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hnsw = False
+        self._mirror: Optional[VectorMirror] = None
+        self._fts = False
+        self._fts_built_at = 0.0
+        self._fts_dirty = False
+        self._hits: dict[str, int] = {}  # 待写入的命中计数（url -> 次数），由写入任务合并提交
+        self._hits_lock = threading.Lock()
+        self._last_activity = time.monotonic()
+        self._readers = 0  # 进行中的检索数（事件循环内计数）；非零时空闲维护不运行
+        self._maintained_at = time.monotonic()
+        self._deletes_since_compact = 0  # 删除累计到 VECTOR_HNSW_COMPACT_DELETES 后压缩索引
 
-    async def add(self, content: str, url: Optional[str], source: str, embedding: List[float]) -> None:
-        """Add one document; skip if url already exists (dedup by URL)."""
-        await asyncio.to_thread(
-            _sync_add,
-            content,
-            url,
-            source,
-            embedding,
-            self._db_path,
-            self._dim,
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        """New cursor on the shared connection, opening it (and setting up the schema) on first use."""
+        with self._conn_lock:
+            if self._conn is None:
+                conn = duckdb.connect(self._db_path)
+                # 初始化在临时游标上做并随即关闭：未读完的结果（fetchone）会让共享连接一直挂着事务，CHECKPOINT 因此失败
+                setup = conn.cursor()
+                try:
+                    # 注册的 object 列（正文、URL、二进制码）都是 str：跳过逐值类型采样（无 pandas 时每个值都会尝试 import）
+                    setup.execute("SET GLOBAL pandas_analyze_sample = 0")
+                    _ensure_db_and_table(setup, self._dim)
+                except Exception:
+                    setup.close()
+                    conn.close()
+                    raise
+                self._conn = conn
+                try:
+                    self._open_extras(setup)
+                finally:
+                    setup.close()
+            return self._conn.cursor()
+
+    def _open_extras(self, conn: duckdb.DuckDBPyConnection) -> None:
+        """HNSW, mirror and FTS setup on first open; each one failing only disables that feature."""
+        if self._settings.VECTOR_HNSW_ENABLED:
+            try:
+                _ensure_hnsw(conn)
+                self._hnsw = True
+            except Exception as e:
+                # 索引不可用时同样的查询退化为全表 Top-N
+                logger.warning("vector_store_hnsw_unavailable", path=self._db_path, error=str(e))
+        if self._settings.VECTOR_MIRROR_ENABLED and self._settings.VECTOR_QUANTIZATION == "none":
+            try:
+                mirror = VectorMirror(mirror_dir(self._db_path), self._dim)
+                mirror.load(conn)
+                self._mirror = mirror
+            except Exception as e:
+                logger.warning("vector_mirror_unavailable", path=self._db_path, error=str(e))
+        if self._settings.VECTOR_SEARCH_MODE == "hybrid":
+            try:
+                _ensure_fts(conn)
+                if _fts_stale(conn):
+                    _rebuild_fts(conn)
+                self._fts = True
+                self._fts_built_at = time.monotonic()
+            except Exception as e:
+                # 没有 FTS 时 hybrid 退化为纯向量检索
+                logger.warning("vector_store_fts_unavailable", path=self._db_path, error=str(e))
+        logger.info(
+            "vector_store_opened",
+            path=self._db_path,
+            dimension=self._dim,
+            hnsw=self._hnsw,
+            mirror=self._mirror is not None,
+            fts=self._fts,
+        )
+
+    async def open(self) -> None:
+        """Open the connection at startup so the first request does not pay for extension loading; start the
+        writer so idle-time maintenance runs even before the first write."""
+        cursor = await asyncio.to_thread(self._cursor)
+        cursor.close()
+        self._ensure_writer()
+
+    async def close(self) -> None:
+        """Drain pending writes, stop the writer, flush hit counters and close the connection."""
+        if self._writer is not None and self._loop is asyncio.get_running_loop() and not self._writer.done():
+            await self._queue.put(None)
+            await self._writer
+        self._writer = self._queue = self._loop = None
+        if self._conn is not None and self._hits:
+            try:
+                await asyncio.to_thread(self._run_hit_flush)
+            except Exception as e:
+                logger.warning("vector_hits_flush_failed", path=self._db_path, error=str(e))
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _ensure_writer(self) -> asyncio.Queue:
+        """Writer task per event loop (the queue and futures are bound to the loop that created them)."""
+        loop = asyncio.get_running_loop()
+        if self._writer is None or self._loop is not loop or self._writer.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._writer = loop.create_task(self._write_loop(self._queue))
+        return self._queue
+
+    async def _write_loop(self, queue: asyncio.Queue) -> None:
+        max_batch = max(1, self._settings.VECTOR_WRITE_BATCH_SIZE)
+        idle = max(1.0, self._settings.VECTOR_MAINTENANCE_IDLE_SECONDS)
+        stopping = False
+        while not stopping:
+            try:
+                first = await asyncio.wait_for(queue.get(), timeout=idle)
+            except asyncio.TimeoutError:
+                await self._idle_tick(idle)
+                continue
+            batch = [first]
+            while len(batch) < max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+            if not batch:
+                continue
+            ops = [op for op, _ in batch]
+            try:
+                results = await asyncio.to_thread(self._run_writes, ops)
+            except Exception as e:
+                logger.warning("vector_add_failed", path=self._db_path, error=str(e))
+                results = [False] * len(batch)
+            for (_, fut), ok in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(ok)
+
+    async def _idle_tick(self, idle: float) -> None:
+        """No write for `idle` seconds: flush hit counters; if reads were quiet too and the interval has passed,
+        run maintenance (retention, index upkeep, checkpoint)."""
+        interval = self._settings.VECTOR_MAINTENANCE_INTERVAL_SECONDS
+        now = time.monotonic()
+        maintain = (
+            interval > 0
+            and not self._readers
+            and now - self._last_activity >= idle
+            and now - self._maintained_at >= interval
+        )
+        try:
+            await asyncio.to_thread(self._run_maintenance if maintain else self._run_hit_flush)
+        except Exception as e:
+            logger.warning("vector_store_maintenance_failed", path=self._db_path, error=str(e))
+        if maintain:
+            self._maintained_at = time.monotonic()
+
+    @contextlib.contextmanager
+    def _reading(self) -> Iterator[None]:
+        """Mark a search as in flight from its start, so idle maintenance (eviction, mirror rebuild) waits for it."""
+        self._readers += 1
+        self._last_activity = time.monotonic()
+        try:
+            yield
+        finally:
+            self._readers -= 1
+            self._last_activity = time.monotonic()
+
+    def _record_hits(self, results: List[List[dict]]) -> None:
+        self._last_activity = time.monotonic()
+        with self._hits_lock:
+            for hits in results:
+                for hit in hits:
+                    if hit.get("url"):
+                        self._hits[hit["url"]] = self._hits.get(hit["url"], 0) + 1
+
+    def _flush_hits(self, cursor: duckdb.DuckDBPyConnection) -> None:
+        with self._hits_lock:
+            hits, self._hits = self._hits, {}
+        if not hits:
+            return
+        cursor.register(
+            "hit_counts",
+            {"url": np.array(list(hits), dtype=object), "n": np.array(list(hits.values()), dtype=np.int64)},
+        )
+        cursor.execute(
+            "UPDATE knowledge SET hit_count = hit_count + h.n, last_hit_at = now()"
+            " FROM hit_counts h WHERE knowledge.url = h.url"
+        )
+
+    def _run_hit_flush(self) -> None:
+        cursor = self._cursor()
+        try:
+            self._flush_hits(cursor)
+        finally:
+            cursor.close()
+
+    def _run_maintenance(self) -> None:
+        settings = self._settings
+        cursor = self._cursor()
+        try:
+            self._flush_hits(cursor)
+            cursor.execute("CHECKPOINT")
+            cursor.begin()
+            try:
+                docs, passages = _evict(
+                    cursor,
+                    settings.VECTOR_RETENTION_TTL_DAYS,
+                    settings.VECTOR_RETENTION_MAX_ROWS,
+                    settings.VECTOR_RETENTION_MAX_BYTES,
+                    self._dim,
+                )
+                cursor.commit()
+            except Exception:
+                cursor.rollback()
+                raise
+            if docs:
+                logger.info("vector_store_evicted", path=self._db_path, documents=docs, passages=passages)
+                self._deletes_since_compact += docs + passages
+                self._fts_dirty = True
+                if self._mirror is not None:
+                    self._mirror.rebuild(cursor)
+            self._maintain_indexes(cursor)
+            if docs:
+                cursor.execute("CHECKPOINT")
+        finally:
+            cursor.close()
+
+    def _run_writes(self, ops: List[WriteOp]) -> List[bool]:
+        self._last_activity = time.monotonic()
+        cursor = self._cursor()
+        try:
+            results = _apply_writes(cursor, ops, self._db_path)
+            if self._mirror is not None and any(results):
+                self._mirror.sync(cursor)
+            self._fts_dirty = self._fts_dirty or any(results)
+            self._flush_hits(cursor)
+            self._maintain_indexes(cursor)
+            return results
+        finally:
+            cursor.close()
+
+    def _maintain_indexes(self, cursor: duckdb.DuckDBPyConnection) -> None:
+        """HNSW compaction once enough rows were deleted; throttled FTS rebuild when rows changed."""
+        if self._hnsw and self._deletes_since_compact >= self._settings.VECTOR_HNSW_COMPACT_DELETES:
+            _compact_hnsw(cursor)
+            logger.info("vector_store_hnsw_compacted", deletes=self._deletes_since_compact)
+            self._deletes_since_compact = 0
+        if (
+            self._fts
+            and self._fts_dirty
+            and time.monotonic() - self._fts_built_at >= self._settings.VECTOR_FTS_REFRESH_SECONDS
+        ):
+            # 全量重建，按间隔节流；新写入的段落在此之前只能被向量检索命中
+            _rebuild_fts(cursor)
+            self._fts_built_at = time.monotonic()
+            self._fts_dirty = False
+            logger.info("vector_store_fts_rebuilt", path=self._db_path)
+
+    async def _submit(self, op: WriteOp) -> bool:
+        """Queue a write and wait until its batch is committed; False if it failed (already logged)."""
+        queue = self._ensure_writer()
+        fut = asyncio.get_running_loop().create_future()
+        await queue.put((op, fut))
+        return await fut
+
+    async def add(self, content: str, url: Optional[str], source: str, embedding: np.ndarray) -> None:
+        """Add one document; skip if url already exists (dedup by URL). Domain and fetched_at are filled in."""
+        await self._submit(lambda conn: _write_many(conn, [(content, url, source, embedding)], self._dim))
+
+    async def add_document(
+        self,
+        content: str,
+        url: Optional[str],
+        source: str,
+        passages: List[str],
+        embeddings: np.ndarray,
+        content_type: Optional[str] = None,
+        language: Optional[str] = None,
+    ) -> None:
+        """Add a document with its passages (embeddings: float32, one row per passage) and metadata for
+        SearchFilter; skip if url exists."""
+        await self._submit(
+            lambda conn: _write_document(
+                conn, content, url, source, passages, embeddings, self._dim, content_type, language
+            )
         )
 
     async def add_many(
         self,
-        items: List[tuple[str, Optional[str], str, List[float]]],
+        items: List[tuple[str, Optional[str], str, np.ndarray]],
     ) -> None:
-        """Add multiple (content, url, source, embedding); dedup by URL per item."""
-        for content, url, source, embedding in items:
-            await self.add(content, url, source, embedding)
+        """Add multiple (content, url, source, embedding) in one statement and transaction; dedup by URL."""
+        if items:
+            await self._submit(lambda conn: _write_many(conn, list(items), self._dim))
+
+    def _search_sync(
+        self, query_embedding: np.ndarray, top_k: int, min_similarity: float, filters: Optional[SearchFilter]
+    ) -> List[dict]:
+        try:
+            cursor = self._cursor()
+        except Exception as e:
+            logger.warning("vector_search_failed", path=self._db_path, error=str(e))
+            return []
+        try:
+            if self._mirror is not None:
+                return _mirror_search(
+                    cursor,
+                    self._mirror,
+                    query_embedding,
+                    top_k,
+                    min_similarity,
+                    self._settings.PASSAGES_PER_DOCUMENT,
+                    filters,
+                )[0]
+            return _sync_search(
+                cursor,
+                query_embedding,
+                top_k,
+                min_similarity,
+                self._settings.PASSAGES_PER_DOCUMENT,
+                self._dim,
+                self._hnsw,
+                filters,
+            )
+        except Exception as e:
+            logger.warning("vector_search_failed", path=self._db_path, error=str(e))
+            return []
+        finally:
+            cursor.close()
+
+    def _search_many_sync(
+        self,
+        query_embeddings: List[np.ndarray],
+        top_k: int,
+        min_similarity: float,
+        filters: Optional[SearchFilter],
+    ) -> List[List[dict]]:
+        try:
+            cursor = self._cursor()
+        except Exception as e:
+            logger.warning("vector_search_failed", path=self._db_path, error=str(e))
+            return [[] for _ in query_embeddings]
+        per_doc = self._settings.PASSAGES_PER_DOCUMENT
+        try:
+            if self._mirror is not None:
+                return _mirror_search(
+                    cursor, self._mirror, np.stack(query_embeddings), top_k, min_similarity, per_doc, filters
+                )
+            if len(query_embeddings) > 1 and not self._hnsw and self._settings.VECTOR_QUANTIZATION == "none":
+                return _sync_search_many(
+                    cursor, np.stack(query_embeddings), top_k, min_similarity, per_doc, self._dim, filters
+                )
+            # HNSW：每个查询一次索引探测，无需合并扫描；量化路径各自取候选。同一线程、同一 cursor 依次执行
+            return [
+                _sync_search(cursor, q, top_k, min_similarity, per_doc, self._dim, self._hnsw, filters)
+                for q in query_embeddings
+            ]
+        except Exception as e:
+            logger.warning("vector_search_failed", path=self._db_path, error=str(e))
+            return [[] for _ in query_embeddings]
+        finally:
+            cursor.close()
+
+    def _bm25_many_sync(
+        self,
+        query_embeddings: List[np.ndarray],
+        query_texts: List[str],
+        top_k: int,
+        filters: Optional[SearchFilter],
+    ) -> List[List[dict]]:
+        try:
+            cursor = self._cursor()
+        except Exception as e:
+            logger.warning("vector_bm25_failed", path=self._db_path, error=str(e))
+            return [[] for _ in query_texts]
+        per_doc = self._settings.PASSAGES_PER_DOCUMENT
+        try:
+            return [
+                _sync_bm25(cursor, q, text, top_k, per_doc, self._dim, filters) if text.strip() else []
+                for q, text in zip(query_embeddings, query_texts)
+            ]
+        except Exception as e:
+            # 索引重建中或查询无法解析：本次只用向量结果
+            logger.warning("vector_bm25_failed", path=self._db_path, error=str(e))
+            return [[] for _ in query_texts]
+        finally:
+            cursor.close()
+
+    async def search_many(
+        self,
+        query_embeddings: List[np.ndarray],
+        top_k: Optional[int] = None,
+        min_similarity: Optional[float] = None,
+        query_texts: Optional[List[str]] = None,
+        filters: Optional[SearchFilter] = None,
+    ) -> List[List[dict]]:
+        """`search` for several queries in one thread hop (and one table pass when unindexed); one list per query.
+        With VECTOR_SEARCH_MODE=hybrid and `query_texts`, BM25 runs concurrently and each list is RRF-fused.
+        `filters` apply to every query."""
+        if not query_embeddings:
+            return []
+        valid = [i for i, q in enumerate(query_embeddings) if np.asarray(q).size]
+        if len(valid) < len(query_embeddings):
+            # 没拿到向量的查询（embedding 被拒）直接空结果，其余照常检索
+            found = await self.search_many(
+                [query_embeddings[i] for i in valid],
+                top_k,
+                min_similarity,
+                [query_texts[i] for i in valid] if query_texts else None,
+                filters,
+            )
+            out: List[List[dict]] = [[] for _ in query_embeddings]
+            for i, hits in zip(valid, found):
+                out[i] = hits
+            return out
+        k = top_k if top_k is not None else self._settings.TOP_K
+        min_s = min_similarity if min_similarity is not None else self._settings.MIN_SIMILARITY_SCORE
+        embeds = list(query_embeddings)
+        with self._reading():
+            if not (self._fts and query_texts):
+                results = await asyncio.to_thread(self._search_many_sync, embeds, k, min_s, filters)
+            else:
+                vector, bm25 = await asyncio.gather(
+                    asyncio.to_thread(self._search_many_sync, embeds, k, min_s, filters),
+                    asyncio.to_thread(self._bm25_many_sync, embeds, list(query_texts), k, filters),
+                )
+                per_doc = self._settings.PASSAGES_PER_DOCUMENT
+                rrf_k = self._settings.HYBRID_RRF_K
+                results = [_rrf_fuse([v, b], k, per_doc, rrf_k) for v, b in zip(vector, bm25)]
+        self._record_hits(results)
+        return results
 
     async def search(
         self,
-        query_embedding: List[float],
+        query_embedding: np.ndarray,
         top_k: Optional[int] = None,
         min_similarity: Optional[float] = None,
+        query_text: Optional[str] = None,
+        filters: Optional[SearchFilter] = None,
     ) -> List[dict]:
-        """Return top_k hits with similarity >= min_similarity."""
+        """Return top_k documents with similarity >= min_similarity; for chunked documents the hit content is
+        the best PASSAGES_PER_DOCUMENT matching passages (also listed under "passages"). In hybrid mode with
+        `query_text`, BM25 keyword hits (not subject to min_similarity) are fused in by reciprocal rank.
+        `filters` (SearchFilter: source, domain, content type, language, fetched_at) restrict the documents
+        searched, inside the scan rather than by over-fetching."""
+        if not np.asarray(query_embedding).size:
+            return []
         k = top_k if top_k is not None else self._settings.TOP_K
         min_s = min_similarity if min_similarity is not None else self._settings.MIN_SIMILARITY_SCORE
-        return await asyncio.to_thread(
-            _sync_search,
-            query_embedding,
-            k,
-            min_s,
-            self._db_path,
-            self._dim,
-        )
+        if self._fts and query_text:
+            return (await self.search_many([query_embedding], k, min_s, [query_text], filters))[0]
+        with self._reading():
+            hits = await asyncio.to_thread(self._search_sync, query_embedding, k, min_s, filters)
+        self._record_hits([hits])
+        return hits
 
 
 _vector_store: Optional[VectorStore] = None
@@ -157,3 +1278,10 @@ def get_vector_store() -> VectorStore:
     if _vector_store is None:
         _vector_store = VectorStore()
     return _vector_store
+
+
+async def close_vector_store() -> None:
+    global _vector_store
+    if _vector_store is not None:
+        await _vector_store.close()
+        _vector_store = None
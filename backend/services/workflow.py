@@ -11,11 +11,15 @@ from backend.core.logging_config import get_logger
 from backend.services import agent
 from backend.services import content_fetch
 from backend.services import embedding
+from backend.services import ingest
 from backend.services import search as search_service
 from backend.services import vector_store
+from backend.services.url_canon import canonicalize_url
 
 logger = get_logger(__name__)
 
+_MIN_PROVIDED_CONTENT = 500  # 搜索结果自带正文短于此长度时仍走 fetch_content
+
 
 async def run_workflow(
     query: str,
@@ -32,6 +36,7 @@ async def run_workflow(
     sub_tasks: List[str] = []
     retrieval_results: List[dict] = []
     summaries: List[tuple[str, str]] = []
+    web_batch: Optional[asyncio.Task] = None
 
     try:
         # Step 1: Decompose
@@ -53,28 +58,40 @@ async def run_workflow(
         if from_step <= 2:
             store = vector_store.get_vector_store()
             seen_urls: set[str] = set()
+            # 子任务 embedding 一次批量请求算好：向量检索与语义搜索缓存共用
+            sub_task_embeds = await embedding.embed_texts(list(sub_tasks))
+            # 所有子任务的联网搜索一次发出（Serper 原生批量 / 其余有界并发），与向量检索重叠
+            web_batch = asyncio.create_task(
+                search_service.search_web_many(
+                    sub_tasks, count=8, query_embeddings=sub_task_embeds
+                )
+            )
+            # 所有子任务的向量检索一次完成（一次线程切换；无索引时一次扫描）
+            vector_batch = await store.search_many(
+                sub_task_embeds,
+                top_k=settings.TOP_K,
+                min_similarity=settings.MIN_SIMILARITY_SCORE,
+                query_texts=list(sub_tasks),
+            )
             for i, st in enumerate(sub_tasks):
                 yield {
                     "event": "step2_retrieval_start",
                     "data": {"index": i, "sub_task": st},
                 }
-                st_embed = await embedding.embed_text(st)
-                vector_hits = await store.search(
-                    st_embed,
-                    top_k=settings.TOP_K,
-                    min_similarity=settings.MIN_SIMILARITY_SCORE,
-                )
+                st_embed = sub_task_embeds[i]
+                vector_hits = vector_batch[i]
                 hits: List[dict] = []
-                web_results = await search_service.search_web(st, count=8)
+                web_results = (await web_batch)[i]
                 logger.info(
                     "retrieval_web_results", sub_task=st[:60], n=len(web_results)
                 )
                 candidates: List[dict] = []
                 for w in web_results[:5]:
-                    url = (w.get("url") or "").strip()
-                    if not url or url in seen_urls:
+                    # 去重按规范 URL；抓取与展示仍用提供方原样的 url（缓存里的旧结果可能没有 canonical_url）
+                    key = w.get("canonical_url") or canonicalize_url((w.get("url") or "").strip())
+                    if not key or key in seen_urls:
                         continue
-                    seen_urls.add(url)
+                    seen_urls.add(key)
                     candidates.append(w)
 
                 total_expected = len(vector_hits) + len(candidates)
@@ -83,7 +100,8 @@ async def run_workflow(
                 for h in vector_hits:
                     url = h.get("url") or ""
                     if url:
-                        seen_urls.add(url)
+                        # 旧库里可能存的是未规范化的写法
+                        seen_urls.add(canonicalize_url(url))
                     hit = {
                         "content": h.get("content", ""),
                         "url": url,
@@ -113,21 +131,29 @@ async def run_workflow(
                     if not url:
                         return None
                     try:
-                        fetched = await content_fetch.fetch_content(url)
+                        provided = w.get("content") or ""
+                        if len(provided) >= _MIN_PROVIDED_CONTENT:
+                            # 搜索提供方已带正文（Exa contents），省去一次抓取往返
+                            fetched = {"content": provided, "source": "exa", "content_type": "text"}
+                        else:
+                            fetched = await content_fetch.fetch_content(url)
                         content = fetched.get("content", "")
                         if content:
-                            emb = await embedding.embed_text(content[:8000])
-                            await store.add(
-                                content[:12000],
+                            # 切段 + 批量 embedding + 入库；只把与子任务最相关的段落交给总结
+                            doc = await ingest.ingest_document(
+                                content,
                                 url,
                                 fetched.get("source", "web"),
-                                emb,
+                                content_type=fetched.get("content_type"),
+                            )
+                            best = ingest.best_passages(
+                                doc, st_embed, settings.PASSAGES_PER_DOCUMENT
                             )
                             return {
-                                "content": content[:4000],
+                                "content": "\n\n".join(p for p, _ in best),
                                 "url": url,
                                 "source": fetched.get("source"),
-                                "similarity": 0.0,
+                                "similarity": max((sim for _, sim in best), default=0.0),
                             }
                     except Exception as e:
                         logger.warning(
@@ -218,3 +244,10 @@ async def run_workflow(
     except Exception as e:
         logger.exception("workflow_error", error=str(e))
         yield {"event": "error", "data": {"message": str(e)}}
+    finally:
+        # 客户端断开（生成器被关闭）或中途出错时，提前发出的联网搜索不能无人等待
+        if web_batch is not None:
+            if not web_batch.done():
+                web_batch.cancel()
+            elif not web_batch.cancelled():
+                web_batch.exception()  # 标记异常已读取，避免 "Task exception was never retrieved"